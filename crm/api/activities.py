@@ -1,320 +1,769 @@
 import json
+from functools import cached_property
 
 import frappe
-from bs4 import BeautifulSoup
 from frappe import _
-from frappe.desk.form.load import get_docinfo
-from frappe.query_builder import JoinType
+from frappe.query_builder import JoinType, Order
+from frappe.utils import cint, get_datetime
 
-from crm.fcrm.doctype.crm_call_log.crm_call_log import parse_call_log
+from crm.api.encoding import encode_rows, is_compact, send_response
+from crm.api.pagination import decode_cursor, encode_cursor
+from crm.fcrm.doctype.crm_call_log.crm_call_log import parse_call_logs
+from crm.utils.html_extract import get_first_link
 
 
 @frappe.whitelist()
-def get_activities(name):
-	if frappe.db.exists("CRM Deal", name):
-		return get_deal_activities(name)
-	elif frappe.db.exists("CRM Lead", name):
-		return get_lead_activities(name)
+def get_activities(name, response_format=None):
+	timeline = ActivityTimeline(get_timeline_doctype(name), name)
+	if is_feed_ready():
+		activities = timeline.build_from_feed()
 	else:
-		frappe.throw(_("Document not found"), frappe.DoesNotExistError)
+		activities = timeline.build()
 
+	if is_compact(response_format):
+		# activities, calls, notes, tasks and attachments
+		activities = [encode_rows(rows) for rows in activities]
 
-def get_deal_activities(name):
-	get_docinfo("", "CRM Deal", name)
-	docinfo = frappe.response["docinfo"]
-	deal_meta = frappe.get_meta("CRM Deal")
-	deal_fields = {
-		field.fieldname: {"label": field.label, "options": field.options} for field in deal_meta.fields
-	}
-	avoid_fields = [
-		"lead",
-		"response_by",
-		"sla_creation",
-		"sla",
-		"first_response_time",
-		"first_responded_on",
-	]
+	return send_response(activities, response_format)
 
-	doc = frappe.db.get_values("CRM Deal", name, ["creation", "owner", "lead"])[0]
-	lead = doc[2]
 
-	activities = []
-	calls = []
-	notes = []
-	tasks = []
-	attachments = []
-	creation_text = "created this deal"
-
-	if lead:
-		activities, calls, notes, tasks, attachments = get_lead_activities(lead)
-		creation_text = "converted the lead to this deal"
-
-	activities.append(
-		{
-			"activity_type": "creation",
-			"creation": doc[0],
-			"owner": doc[1],
-			"data": creation_text,
-			"is_lead": False,
-		}
+@frappe.whitelist()
+def get_activity_page(name, limit=50, cursor=None, since=None, response_format=None):
+	"""
+	Get the newest activities of a lead or deal, older ones page by page.
+
+	Calls, notes, tasks and attachments are only sent with the first page.
+
+	:param cursor: `next_cursor` of the previous page
+	:param since: only get activities created after this, to refresh an open timeline
+	:return: `activities` and `next_cursor`, `None` when there are no older activities
+	"""
+	before, skip = None, []
+	if cursor:
+		before, skip = decode_cursor(cursor, TIMELINE_CURSOR_COLUMNS)
+		before = get_datetime(before)
+
+	timeline = ActivityTimeline(
+		get_timeline_doctype(name),
+		name,
+		limit=max(cint(limit), 1),
+		before=before,
+		after=get_datetime(since) if since else None,
+		skip=skip,
 	)
+	activities, next_cursor = timeline.build_page()
+	response = {"activities": activities, "next_cursor": next_cursor}
+
+	if not cursor and not since:
+		response.update(
+			{
+				"calls": timeline.calls,
+				"notes": timeline.notes,
+				"tasks": timeline.tasks,
+				"attachments": timeline.get_document_attachments(),
+			}
+		)
 
-	docinfo.versions.reverse()
+	if is_compact(response_format):
+		for key in ("activities", "calls", "notes", "tasks", "attachments"):
+			if key in response:
+				response[key] = encode_rows(response[key])
 
-	for version in docinfo.versions:
-		data = json.loads(version.data)
-		if not data.get("changed"):
-			continue
+	return send_response(response, response_format)
 
-		if change := data.get("changed")[0]:
-			field = deal_fields.get(change[0], None)
 
-			if not field or change[0] in avoid_fields or (not change[1] and not change[2]):
-				continue
+@frappe.whitelist()
+def get_attachments(doctype, names):
+	"""
+	Files attached to records of `doctype`, for panels listing notes or tasks.
 
-			field_label = field.get("label") or change[0]
-			field_option = field.get("options") or None
+	:param names: names of the records, those the user cannot read are left out
+	:return: lists of files keyed by record name
+	"""
+	names = frappe.parse_json(names)
+	permitted = frappe.get_list(doctype, filters={"name": ("in", names)}, pluck="name") if names else []
+	attachments = get_attachments_by_reference((doctype, name) for name in permitted)
+	return {name: attachments.get((doctype, name), []) for name in permitted}
 
-			activity_type = "changed"
-			data = {
-				"field": change[0],
-				"field_label": field_label,
-				"old_value": change[1],
-				"value": change[2],
-			}
 
-			if not change[1] and change[2]:
-				activity_type = "added"
-				data = {
-					"field": change[0],
-					"field_label": field_label,
-					"value": change[2],
-				}
-			elif change[1] and not change[2]:
-				activity_type = "removed"
-				data = {
-					"field": change[0],
-					"field_label": field_label,
-					"value": change[1],
-				}
-
-		activity = {
-			"activity_type": activity_type,
-			"creation": version.creation,
-			"owner": version.owner,
-			"data": data,
-			"is_lead": False,
-			"options": field_option,
-		}
-		activities.append(activity)
-
-	for comment in docinfo.comments:
-		activity = {
-			"name": comment.name,
-			"activity_type": "comment",
-			"creation": comment.creation,
-			"owner": comment.owner,
-			"content": comment.content,
-			"attachments": get_attachments("Comment", comment.name),
-			"is_lead": False,
-		}
-		activities.append(activity)
-
-	for communication in docinfo.communications + docinfo.automated_messages:
-		activity = {
-			"activity_type": "communication",
-			"communication_type": communication.communication_type,
-			"communication_date": communication.communication_date or communication.creation,
-			"creation": communication.creation,
-			"data": {
-				"subject": communication.subject,
-				"content": communication.content,
-				"sender_full_name": communication.sender_full_name,
-				"sender": communication.sender,
-				"recipients": communication.recipients,
-				"cc": communication.cc,
-				"bcc": communication.bcc,
-				"attachments": get_attachments("Communication", communication.name),
-				"read_by_recipient": communication.read_by_recipient,
-				"delivery_status": communication.delivery_status,
-			},
-			"is_lead": False,
-		}
-		activities.append(activity)
-
-	for attachment_log in docinfo.attachment_logs:
-		activity = {
-			"name": attachment_log.name,
-			"activity_type": "attachment_log",
-			"creation": attachment_log.creation,
-			"owner": attachment_log.owner,
-			"data": parse_attachment_log(attachment_log.content, attachment_log.comment_type),
-			"is_lead": False,
-		}
-		activities.append(activity)
+def get_timeline_doctype(name):
+	if frappe.db.exists("CRM Deal", name):
+		return "CRM Deal"
+	if frappe.db.exists("CRM Lead", name):
+		return "CRM Lead"
+	frappe.throw(_("Document not found"), frappe.DoesNotExistError)
 
-	calls = calls + get_linked_calls(name).get("calls", [])
-	notes = notes + get_linked_notes(name) + get_linked_calls(name).get("notes", [])
-	tasks = tasks + get_linked_tasks(name) + get_linked_calls(name).get("tasks", [])
-	attachments = attachments + get_attachments("CRM Deal", name)
 
-	activities.sort(key=lambda x: x["creation"], reverse=True)
-	activities = handle_multiple_versions(activities)
+def is_feed_ready():
+	"""Whether CRM Activity has been backfilled, defaults are stored as strings"""
+	return bool(cint(frappe.db.get_default(ACTIVITY_FEED_READY)))
 
-	return activities, calls, notes, tasks, attachments
+
+def get_deal_activities(name):
+	return ActivityTimeline("CRM Deal", name).build()
 
 
 def get_lead_activities(name):
-	get_docinfo("", "CRM Lead", name)
-	docinfo = frappe.response["docinfo"]
-	lead_meta = frappe.get_meta("CRM Lead")
-	lead_fields = {
-		field.fieldname: {"label": field.label, "options": field.options} for field in lead_meta.fields
-	}
-	avoid_fields = [
+	return ActivityTimeline("CRM Lead", name).build()
+
+
+# set once CRM Activity has been backfilled and can serve timelines
+ACTIVITY_FEED_READY = "crm_activity_feed_ready"
+
+# an activity page ends at the `creation` of its last activity, activities
+# created at that very moment that were already sent are skipped next time
+TIMELINE_CURSOR_COLUMNS = [("creation", "desc"), ("skip", "asc")]
+
+# activity types of field changes recorded by versions
+VERSION_ACTIVITY_TYPES = ["changed", "added", "removed"]
+
+# fields whose changes are not shown on the timeline
+AVOID_FIELDS = {
+	"CRM Lead": [
 		"converted",
 		"response_by",
 		"sla_creation",
 		"sla",
 		"first_response_time",
 		"first_responded_on",
-	]
-
-	doc = frappe.db.get_values("CRM Lead", name, ["creation", "owner"])[0]
-	activities = [
-		{
-			"activity_type": "creation",
-			"creation": doc[0],
-			"owner": doc[1],
-			"data": "created this lead",
-			"is_lead": True,
-		}
-	]
+	],
+	"CRM Deal": ["lead", "response_by", "sla_creation", "sla", "first_response_time", "first_responded_on"],
+}
+
+CALL_LOG_FIELDS = [
+	"name",
+	"caller",
+	"receiver",
+	"from",
+	"to",
+	"duration",
+	"start_time",
+	"end_time",
+	"status",
+	"type",
+	"recording_url",
+	"creation",
+	"note",
+]
+# written with `db.set_value` after the feed entry of the record, read from
+# the record itself when timelines are built from the feed
+LIVE_FIELDS = {
+	"CRM Call Log": ["recording_url"],
+	"Communication": ["delivery_status", "read_by_recipient"],
+}
+NOTE_FIELDS = ["name", "title", "content", "owner", "modified"]
+TASK_FIELDS = ["name", "title", "description", "assigned_to", "due_date", "priority", "status", "modified"]
+FILE_FIELDS = [
+	"name",
+	"file_name",
+	"file_type",
+	"file_url",
+	"file_size",
+	"is_private",
+	"modified",
+	"creation",
+	"owner",
+	"attached_to_doctype",
+	"attached_to_name",
+]
+
+
+class ActivityTimeline:
+	"""
+	Timeline of a lead, or of a deal together with the lead it was converted from.
+
+	Every source (versions, comments, communications, files, calls, notes and
+	tasks) is read with one query covering all documents of the timeline, and
+	only once per timeline.
+
+	With `limit`, versions, comments and communications are each read up to
+	`limit` at a time, newest first, within `after` and `before`.
+	"""
+
+	def __init__(self, doctype, name, limit=None, before=None, after=None, skip=None):
+		self.limit = limit
+		self.before = before
+		self.after = after
+		self.skip = set(skip or [])
+		# `creation` of the oldest row of sources that returned `limit` rows
+		self.cutoffs = []
+
+		self.documents = []
+		if doctype == "CRM Deal":
+			deal = frappe.db.get_value("CRM Deal", name, ["creation", "owner", "lead"], as_dict=True)
+			if deal.lead:
+				self.documents.append(self.get_document("CRM Lead", deal.lead))
+			text = "converted the lead to this deal" if deal.lead else "created this deal"
+			self.documents.append(frappe._dict(doctype=doctype, name=name, creation_text=text, **deal))
+		else:
+			self.documents.append(self.get_document(doctype, name))
+
+		for document in self.documents:
+			frappe.has_permission(document.doctype, "read", document.name, throw=True)
+
+		self.names = [document.name for document in self.documents]
+		self.is_lead = {(d.doctype, d.name): d.doctype == "CRM Lead" for d in self.documents}
+
+	def get_document(self, doctype, name):
+		document = frappe.db.get_value(doctype, name, ["creation", "owner"], as_dict=True) or {}
+		return frappe._dict(doctype=doctype, name=name, creation_text="created this lead", **document)
+
+	def build(self):
+		"""Return activities, calls, notes, tasks and attachments"""
+		activities = self.get_activities()
+		activities = handle_multiple_versions(activities)
+		return activities, self.calls, self.notes, self.tasks, self.get_document_attachments()
+
+	def build_from_feed(self):
+		"""Same as `build`, read from CRM Activity entries of the documents"""
+		entries = frappe.get_all(
+			"CRM Activity",
+			filters=[
+				["CRM Activity", "reference_name", "in", self.names],
+				["CRM Activity", "reference_doctype", "in", [d.doctype for d in self.documents]],
+			],
+			fields=["activity_type", "reference_doctype", "reference_name", "data"],
+			order_by="activity_date desc",
+		)
 
-	docinfo.versions.reverse()
+		activities = self.get_creation_activities()
+		calls, notes, tasks, attachments = [], [], [], []
+		lists = {"call": calls, "note": notes, "task": tasks, "attachment": attachments}
+		for entry in entries:
+			if (entry.reference_doctype, entry.reference_name) not in self.is_lead:
+				continue
+			is_lead = entry.reference_doctype == "CRM Lead"
+			data = json.loads(entry.data)
+			if entry.activity_type == "version":
+				activities += [{**activity, "is_lead": is_lead} for activity in data]
+			elif entry.activity_type in lists:
+				lists[entry.activity_type].append(frappe._dict(data))
+			elif entry.activity_type != "whatsapp":
+				activities.append({**data, "is_lead": is_lead})
+
+		calls = unique(calls)
+		communications = [a for a in activities if a.get("activity_type") == "communication"]
+		set_live_fields([("CRM Call Log", calls), ("Communication", communications)])
+
+		activities.sort(key=lambda x: get_datetime(x["creation"]), reverse=True)
+		activities = handle_multiple_versions(activities)
+		calls = parse_call_logs(calls) if calls else []
+		notes, tasks = unique(notes), unique(tasks)
+		set_attachments([("FCRM Note", notes), ("CRM Task", tasks)])
+		return activities, calls, notes, tasks, unique(attachments)
+
+	def build_page(self):
+		"""
+		Return up to `limit` newest activities and the cursor for older ones.
+
+		A source that returned `limit` rows may have more rows older than its
+		oldest one, so activities older than that are left for the next page.
+		"""
+		activities = [a for a in self.get_activities() if get_activity_key(a) not in self.skip]
+		if self.cutoffs:
+			cutoff = max(self.cutoffs)
+			activities = [a for a in activities if get_datetime(a["creation"]) >= cutoff]
+
+		page = activities[: self.limit]
+		if not page or (len(activities) <= self.limit and not self.cutoffs):
+			return handle_multiple_versions(page), None
+
+		last = page[-1]["creation"]
+		skip = [get_activity_key(a) for a in page if a["creation"] == last]
+		if self.before and get_datetime(last) == self.before:
+			skip += self.skip
+		next_cursor = encode_cursor({"creation": last, "skip": skip}, TIMELINE_CURSOR_COLUMNS)
+		return handle_multiple_versions(page), next_cursor
+
+	def get_activities(self):
+		activities = self.get_creation_activities()
+		activities += self.get_version_activities()
+		activities += self.get_comment_activities()
+		activities += self.get_communication_activities()
+		activities += self.get_attachment_log_activities()
+
+		activities.sort(key=lambda x: x["creation"], reverse=True)
+		return activities
+
+	def get_creation_activities(self):
+		return [
+			{
+				"activity_type": "creation",
+				"creation": document.creation,
+				"owner": document.owner,
+				"data": document.creation_text,
+				"is_lead": document.doctype == "CRM Lead",
+			}
+			for document in self.documents
+			if self.in_range(document.creation)
+		]
+
+	def get_document_attachments(self):
+		return [
+			file
+			for document in self.documents
+			for file in self.get_attachments(document.doctype, document.name)
+		]
+
+	def in_range(self, creation):
+		creation = get_datetime(creation)
+		if self.before and creation > self.before:
+			return False
+		if self.after and creation <= self.after:
+			return False
+		return True
+
+	def get_range_filters(self, doctype):
+		filters = []
+		if self.before:
+			filters.append([doctype, "creation", "<=", self.before])
+		if self.after:
+			filters.append([doctype, "creation", ">", self.after])
+		return filters
+
+	def get_order_by(self):
+		# paged reads take the newest rows first
+		return "creation desc" if self.limit else "creation asc"
+
+	def track_cutoff(self, rows):
+		if self.limit and len(rows) >= self.limit:
+			self.cutoffs.append(get_datetime(rows[-1].creation))
+		return rows
+
+	def get_version_activities(self):
+		versions = frappe.get_all(
+			"Version",
+			filters=[
+				["Version", "ref_doctype", "in", list({document.doctype for document in self.documents})],
+				["Version", "docname", "in", self.names],
+				*self.get_range_filters("Version"),
+			],
+			fields=["name", "owner", "creation", "ref_doctype", "docname"],
+			order_by=self.get_order_by(),
+			limit=self.limit,
+		)
+		self.track_cutoff(versions)
+
+		activities = []
+		for document in self.documents:
+			is_lead = document.doctype == "CRM Lead"
+			document_versions = [
+				v for v in versions if v.ref_doctype == document.doctype and v.docname == document.name
+			]
+			changes = get_version_changes(document.doctype, document.name, document_versions)
+			for version in document_versions:
+				activities += get_change_activities(version, changes[version.name], is_lead)
+		return activities
+
+	def get_comment_activities(self):
+		return [
+			get_comment_activity(
+				comment,
+				self.get_attachments("Comment", comment.name),
+				self.is_lead[(comment.reference_doctype, comment.reference_name)],
+			)
+			for comment in self.comments
+			if comment.comment_type == "Comment"
+		]
+
+	def get_attachment_log_activities(self):
+		return [
+			get_attachment_log_activity(
+				attachment_log,
+				self.is_lead[(attachment_log.reference_doctype, attachment_log.reference_name)],
+			)
+			for attachment_log in self.comments
+			if attachment_log.comment_type != "Comment"
+		]
+
+	def get_communication_activities(self):
+		return [
+			get_communication_activity(
+				communication,
+				self.get_attachments("Communication", communication.name),
+				self.is_lead.get((communication.reference_doctype, communication.reference_name)) or False,
+			)
+			for communication in self.communications
+		]
+
+	def get_attachments(self, doctype, name):
+		return self.files.get((doctype, name), [])
+
+	@cached_property
+	def comments(self):
+		"""Comments and attachment logs"""
+		comments = frappe.get_all(
+			"Comment",
+			filters=[
+				["Comment", "reference_doctype", "in", list({d.doctype for d in self.documents})],
+				["Comment", "reference_name", "in", self.names],
+				["Comment", "comment_type", "in", ["Comment", "Attachment", "Attachment Removed"]],
+				*self.get_range_filters("Comment"),
+			],
+			fields=[
+				"name",
+				"creation",
+				"content",
+				"owner",
+				"comment_type",
+				"reference_doctype",
+				"reference_name",
+			],
+			order_by=self.get_order_by(),
+			limit=self.limit,
+		)
+		self.track_cutoff(comments)
+		return [c for c in comments if (c.reference_doctype, c.reference_name) in self.is_lead]
+
+	@cached_property
+	def communications(self):
+		"""Communications referencing or linked to the documents of the timeline"""
+		Communication = frappe.qb.DocType("Communication")
+		Link = frappe.qb.DocType("Communication Link")
+		linked = (
+			frappe.qb.from_(Link)
+			.select(Link.parent)
+			.where(Link.link_doctype.isin([d.doctype for d in self.documents]))
+			.where(Link.link_name.isin(self.names))
+		)
+		query = (
+			frappe.qb.from_(Communication)
+			.select(
+				Communication.name,
+				Communication.communication_type,
+				Communication.communication_date,
+				Communication.creation,
+				Communication.subject,
+				Communication.content,
+				Communication.sender_full_name,
+				Communication.sender,
+				Communication.recipients,
+				Communication.cc,
+				Communication.bcc,
+				Communication.read_by_recipient,
+				Communication.delivery_status,
+				Communication.reference_doctype,
+				Communication.reference_name,
+			)
+			.where(Communication.communication_type.isin(["Communication", "Automated Message"]))
+			.where(
+				(
+					Communication.reference_doctype.isin([d.doctype for d in self.documents])
+					& Communication.reference_name.isin(self.names)
+				)
+				| Communication.name.isin(linked)
+			)
+		)
+		if self.before:
+			query = query.where(Communication.creation <= self.before)
+		if self.after:
+			query = query.where(Communication.creation > self.after)
+		if self.limit:
+			query = query.orderby(Communication.creation, order=Order.desc).limit(self.limit)
+		return self.track_cutoff(query.run(as_dict=True))
+
+	@cached_property
+	def files(self):
+		"""Files attached to the documents, their comments and their communications"""
+		attached_to = [(d.doctype, d.name) for d in self.documents]
+		attached_to += [("Comment", c.name) for c in self.comments if c.comment_type == "Comment"]
+		attached_to += [("Communication", c.name) for c in self.communications]
+		return get_attachments_by_reference(attached_to)
+
+	@cached_property
+	def linked_calls(self):
+		"""Call logs referencing the documents, or linked to them, their notes or their tasks"""
+		calls = frappe.get_all(
+			"CRM Call Log", filters={"reference_docname": ("in", self.names)}, fields=CALL_LOG_FIELDS
+		)
 
-	for version in docinfo.versions:
-		data = json.loads(version.data)
-		if not data.get("changed"):
-			continue
+		CallLog = frappe.qb.DocType("CRM Call Log")
+		Link = frappe.qb.DocType("Dynamic Link")
+		linked = (
+			frappe.qb.from_(Link)
+			.select(Link.parent)
+			.where(Link.parenttype == "CRM Call Log")
+			.where(Link.link_name.isin(self.names))
+		)
+		links = (
+			frappe.qb.from_(CallLog)
+			.join(Link, JoinType.inner)
+			.on(Link.parent == CallLog.name)
+			.select(*[CallLog[f] for f in CALL_LOG_FIELDS], Link.link_doctype, Link.link_name)
+			.where(Link.parenttype == "CRM Call Log")
+			.where(CallLog.name.isin(linked))
+			.run(as_dict=True)
+		)
 
-		if change := data.get("changed")[0]:
-			field = lead_fields.get(change[0], None)
+		notes = [link.link_name for link in links if link.link_doctype == "FCRM Note"]
+		tasks = [link.link_name for link in links if link.link_doctype == "CRM Task"]
+		calls += [link for link in links if link.link_doctype not in ["FCRM Note", "CRM Task"]]
+		return unique(calls), notes, tasks
+
+	@cached_property
+	def calls(self):
+		calls = self.linked_calls[0]
+		return parse_call_logs(calls) if calls else []
+
+	@cached_property
+	def notes(self):
+		return self.notes_and_tasks[0]
+
+	@cached_property
+	def tasks(self):
+		return self.notes_and_tasks[1]
+
+	@cached_property
+	def notes_and_tasks(self):
+		notes = self.get_linked_records("FCRM Note", NOTE_FIELDS, self.linked_calls[1])
+		tasks = self.get_linked_records("CRM Task", TASK_FIELDS, self.linked_calls[2])
+		set_attachments([("FCRM Note", notes), ("CRM Task", tasks)])
+		return notes, tasks
+
+	def get_linked_records(self, doctype, fields, call_linked_names):
+		records = frappe.get_all(doctype, filters={"reference_docname": ("in", self.names)}, fields=fields)
+		call_linked_names = [name for name in call_linked_names if name not in {r.name for r in records}]
+		if call_linked_names:
+			records += frappe.get_all(doctype, filters={"name": ("in", call_linked_names)}, fields=fields)
+		return records
+
+
+def get_activity_key(activity):
+	key = f"{activity['activity_type']}:{activity.get('name')}:{int(activity['is_lead'])}"
+	if activity["activity_type"] in VERSION_ACTIVITY_TYPES:
+		# a version has an activity per changed field
+		key += f":{activity['data']['field']}"
+	return key
+
+
+def unique(records):
+	"""Drop records with a name seen before"""
+	seen = set()
+	result = []
+	for record in records:
+		if record.name not in seen:
+			seen.add(record.name)
+			result.append(record)
+	return result
+
+
+def get_attachments_by_reference(references):
+	"""
+	Files attached to each of `references` with a single query.
+
+	:param references: (doctype, name) pairs
+	:return: lists of files keyed by (doctype, name), references without files are left out
+	"""
+	references = set(references)
+	if not references:
+		return {}
+
+	File = frappe.qb.DocType("File")
+	files = (
+		frappe.qb.from_(File)
+		.select(*[File[f] for f in FILE_FIELDS])
+		.where(File.attached_to_doctype.isin(list({doctype for doctype, _name in references})))
+		.where(File.attached_to_name.isin(list({name for _doctype, name in references})))
+		.orderby(File.creation)
+		.run(as_dict=True)
+	)
 
-			if not field or change[0] in avoid_fields or (not change[1] and not change[2]):
-				continue
+	attachments = {}
+	for file in files:
+		key = (file.attached_to_doctype, file.attached_to_name)
+		if key in references:
+			attachments.setdefault(key, []).append(file)
+	return attachments
 
-			field_label = field.get("label") or change[0]
-			field_option = field.get("options") or None
 
-			activity_type = "changed"
-			data = {
-				"field": change[0],
-				"field_label": field_label,
-				"old_value": change[1],
-				"value": change[2],
-			}
+def set_attachments(records_by_doctype):
+	"""
+	Set `attachments` on records of several doctypes with a single query.
 
-			if not change[1] and change[2]:
-				activity_type = "added"
-				data = {
-					"field": change[0],
-					"field_label": field_label,
-					"value": change[2],
-				}
-			elif change[1] and not change[2]:
-				activity_type = "removed"
-				data = {
-					"field": change[0],
-					"field_label": field_label,
-					"value": change[1],
-				}
-
-		activity = {
-			"activity_type": activity_type,
-			"creation": version.creation,
-			"owner": version.owner,
-			"data": data,
-			"is_lead": True,
-			"options": field_option,
-		}
-		activities.append(activity)
-
-	for comment in docinfo.comments:
-		activity = {
-			"name": comment.name,
-			"activity_type": "comment",
-			"creation": comment.creation,
-			"owner": comment.owner,
-			"content": comment.content,
-			"attachments": get_attachments("Comment", comment.name),
-			"is_lead": True,
-		}
-		activities.append(activity)
-
-	for communication in docinfo.communications + docinfo.automated_messages:
-		activity = {
-			"activity_type": "communication",
-			"communication_type": communication.communication_type,
-			"communication_date": communication.communication_date or communication.creation,
-			"creation": communication.creation,
-			"data": {
-				"subject": communication.subject,
-				"content": communication.content,
-				"sender_full_name": communication.sender_full_name,
-				"sender": communication.sender,
-				"recipients": communication.recipients,
-				"cc": communication.cc,
-				"bcc": communication.bcc,
-				"attachments": get_attachments("Communication", communication.name),
-				"read_by_recipient": communication.read_by_recipient,
-				"delivery_status": communication.delivery_status,
-			},
-			"is_lead": True,
-		}
-		activities.append(activity)
-
-	for attachment_log in docinfo.attachment_logs:
-		activity = {
-			"name": attachment_log.name,
-			"activity_type": "attachment_log",
-			"creation": attachment_log.creation,
-			"owner": attachment_log.owner,
-			"data": parse_attachment_log(attachment_log.content, attachment_log.comment_type),
-			"is_lead": True,
+	:param records_by_doctype: (doctype, records) pairs
+	"""
+	attachments = get_attachments_by_reference(
+		(doctype, record.name) for doctype, records in records_by_doctype for record in records
+	)
+	for doctype, records in records_by_doctype:
+		for record in records:
+			record.attachments = attachments.get((doctype, record.name), [])
+
+
+def set_live_fields(records_by_doctype):
+	"""Refresh `LIVE_FIELDS` of records read from the feed, with one query per doctype"""
+	for doctype, records in records_by_doctype:
+		if not records:
+			continue
+		fields = LIVE_FIELDS[doctype]
+		values = {
+			d.name: d
+			for d in frappe.get_all(
+				doctype,
+				filters={"name": ("in", [r["name"] for r in records])},
+				fields=["name", *fields],
+			)
 		}
-		activities.append(activity)
+		for record in records:
+			if record["name"] not in values:
+				continue
+			# communications keep these fields under `data`
+			target = record["data"] if doctype == "Communication" else record
+			target.update({f: values[record["name"]][f] for f in fields})
+
+
+def get_comment_activity(comment, attachments, is_lead):
+	return {
+		"name": comment.name,
+		"activity_type": "comment",
+		"creation": comment.creation,
+		"owner": comment.owner,
+		"content": frappe.utils.markdown(comment.content),
+		"attachments": attachments,
+		"is_lead": is_lead,
+	}
 
-	calls = get_linked_calls(name).get("calls", [])
-	notes = get_linked_notes(name) + get_linked_calls(name).get("notes", [])
-	tasks = get_linked_tasks(name) + get_linked_calls(name).get("tasks", [])
-	attachments = get_attachments("CRM Lead", name)
 
-	activities.sort(key=lambda x: x["creation"], reverse=True)
-	activities = handle_multiple_versions(activities)
+def get_attachment_log_activity(attachment_log, is_lead):
+	return {
+		"name": attachment_log.name,
+		"activity_type": "attachment_log",
+		"creation": attachment_log.creation,
+		"owner": attachment_log.owner,
+		"data": parse_attachment_log(attachment_log.content, attachment_log.comment_type),
+		"is_lead": is_lead,
+	}
 
-	return activities, calls, notes, tasks, attachments
 
+def get_communication_activity(communication, attachments, is_lead):
+	return {
+		"name": communication.name,
+		"activity_type": "communication",
+		"communication_type": communication.communication_type,
+		"communication_date": communication.communication_date or communication.creation,
+		"creation": communication.creation,
+		"data": {
+			"subject": communication.subject,
+			"content": communication.content,
+			"sender_full_name": communication.sender_full_name,
+			"sender": communication.sender,
+			"recipients": communication.recipients,
+			"cc": communication.cc,
+			"bcc": communication.bcc,
+			"attachments": attachments,
+			"read_by_recipient": communication.read_by_recipient,
+			"delivery_status": communication.delivery_status,
+		},
+		"is_lead": is_lead,
+	}
 
-def get_attachments(doctype, name):
-	return (
-		frappe.db.get_all(
-			"File",
-			filters={"attached_to_doctype": doctype, "attached_to_name": name},
-			fields=[
-				"name",
-				"file_name",
-				"file_type",
-				"file_url",
-				"file_size",
-				"is_private",
-				"modified",
-				"creation",
-				"owner",
-			],
+
+def get_version_changes(doctype, docname, versions):
+	"""
+	Changed fields of each of `versions` of a document, keyed by version name.
+
+	Versions never change once written, so their changes are parsed once and
+	cached per document. `data` is only read for versions not cached yet,
+	either from the version itself or with one query for all of them.
+	"""
+	key = get_version_changes_key(doctype, docname)
+	cache = frappe.cache()
+	changes = {}
+	for version_name, version_changes in (cache.hgetall(key) or {}).items():
+		version_name = version_name.decode() if isinstance(version_name, bytes) else version_name
+		changes[version_name] = version_changes
+
+	missing = [v for v in versions if v.name not in changes]
+	if not missing:
+		return changes
+
+	data = {v.name: v.data for v in missing if v.get("data")}
+	if len(data) < len(missing):
+		data.update(
+			frappe.get_all(
+				"Version",
+				filters={"name": ("in", [v.name for v in missing if v.name not in data])},
+				fields=["name", "data"],
+				as_list=True,
+			)
 		)
-		or []
-	)
+
+	for version in missing:
+		changes[version.name] = parse_version_changes(doctype, data.get(version.name))
+		cache.hset(key, version.name, changes[version.name])
+	return changes
+
+
+def get_version_changes_key(doctype, docname):
+	return f"crm_version_changes:{doctype}:{docname}"
+
+
+def clear_version_changes(doctype):
+	"""Drop parsed changes of all versions of `doctype`, labels come from its meta"""
+	frappe.cache().delete_keys(f"crm_version_changes:{doctype}:")
+
+
+def parse_version_changes(doctype, data):
+	"""Changes recorded in a version's `data`, labelled from meta, without fields hidden from timelines"""
+	fields = {field.fieldname: field for field in frappe.get_meta(doctype).fields}
+	changes = []
+	for fieldname, old_value, value in json.loads(data or "{}").get("changed") or []:
+		field = fields.get(fieldname)
+		if not field or fieldname in AVOID_FIELDS[doctype] or (not old_value and not value):
+			continue
+		changes.append(
+			{
+				"field": fieldname,
+				"field_label": field.label or fieldname,
+				"options": field.options or None,
+				"old_value": old_value,
+				"value": value,
+			}
+		)
+	return changes
+
+
+def get_change_activities(version, changes, is_lead):
+	"""One activity per field changed in `version`"""
+	activities = []
+	for change in changes:
+		activity_type = "changed"
+		data = {
+			"field": change["field"],
+			"field_label": change["field_label"],
+			"old_value": change["old_value"],
+			"value": change["value"],
+		}
+
+		if not change["old_value"] and change["value"]:
+			activity_type = "added"
+			data = {"field": change["field"], "field_label": change["field_label"], "value": change["value"]}
+		elif change["old_value"] and not change["value"]:
+			activity_type = "removed"
+			data = {
+				"field": change["field"],
+				"field_label": change["field_label"],
+				"value": change["old_value"],
+			}
+
+		activities.append(
+			{
+				"name": version.name,
+				"activity_type": activity_type,
+				"creation": version.creation,
+				"owner": version.owner,
+				"data": data,
+				"is_lead": is_lead,
+				"options": change["options"],
+			}
+		)
+	return activities
+
+
+def on_meta_change(doc, method=None):
+	doctype = doc.name if doc.doctype == "DocType" else doc.get("dt") or doc.get("doc_type")
+	if doctype in AVOID_FIELDS:
+		clear_version_changes(doctype)
 
 
 def handle_multiple_versions(versions):
@@ -322,7 +771,7 @@ def handle_multiple_versions(versions):
 	grouped_versions = []
 	old_version = None
 	for version in versions:
-		is_version = version["activity_type"] in ["changed", "added", "removed"]
+		is_version = version["activity_type"] in VERSION_ACTIVITY_TYPES
 		if not is_version:
 			activities.append(version)
 		if not old_version:
@@ -354,132 +803,10 @@ def parse_grouped_versions(versions):
 	return version
 
 
-def get_linked_calls(name):
-	calls = frappe.db.get_all(
-		"CRM Call Log",
-		filters={"reference_docname": name},
-		fields=[
-			"name",
-			"caller",
-			"receiver",
-			"from",
-			"to",
-			"duration",
-			"start_time",
-			"end_time",
-			"status",
-			"type",
-			"recording_url",
-			"creation",
-			"note",
-		],
-	)
-
-	linked_calls = frappe.db.get_all(
-		"Dynamic Link", filters={"link_name": name, "parenttype": "CRM Call Log"}, pluck="parent"
-	)
-
-	notes = []
-	tasks = []
-
-	if linked_calls:
-		CallLog = frappe.qb.DocType("CRM Call Log")
-		Link = frappe.qb.DocType("Dynamic Link")
-		query = (
-			frappe.qb.from_(CallLog)
-			.select(
-				CallLog.name,
-				CallLog.caller,
-				CallLog.receiver,
-				CallLog["from"],
-				CallLog.to,
-				CallLog.duration,
-				CallLog.start_time,
-				CallLog.end_time,
-				CallLog.status,
-				CallLog.type,
-				CallLog.recording_url,
-				CallLog.creation,
-				CallLog.note,
-				Link.link_doctype,
-				Link.link_name,
-			)
-			.join(Link, JoinType.inner)
-			.on(Link.parent == CallLog.name)
-			.where(CallLog.name.isin(linked_calls))
-		)
-		_calls = query.run(as_dict=True)
-
-		for call in _calls:
-			if call.get("link_doctype") == "FCRM Note":
-				notes.append(call.link_name)
-			elif call.get("link_doctype") == "CRM Task":
-				tasks.append(call.link_name)
-
-		_calls = [call for call in _calls if call.get("link_doctype") not in ["FCRM Note", "CRM Task"]]
-		if _calls:
-			calls = calls + _calls
-
-	if notes:
-		notes = frappe.db.get_all(
-			"FCRM Note",
-			filters={"name": ("in", notes)},
-			fields=["name", "title", "content", "owner", "modified"],
-		)
-
-	if tasks:
-		tasks = frappe.db.get_all(
-			"CRM Task",
-			filters={"name": ("in", tasks)},
-			fields=[
-				"name",
-				"title",
-				"description",
-				"assigned_to",
-				"due_date",
-				"priority",
-				"status",
-				"modified",
-			],
-		)
-
-	calls = [parse_call_log(call) for call in calls] if calls else []
-
-	return {"calls": calls, "notes": notes, "tasks": tasks}
-
-
-def get_linked_notes(name):
-	notes = frappe.db.get_all(
-		"FCRM Note",
-		filters={"reference_docname": name},
-		fields=["name", "title", "content", "owner", "modified"],
-	)
-	return notes or []
-
-
-def get_linked_tasks(name):
-	tasks = frappe.db.get_all(
-		"CRM Task",
-		filters={"reference_docname": name},
-		fields=[
-			"name",
-			"title",
-			"description",
-			"assigned_to",
-			"due_date",
-			"priority",
-			"status",
-			"modified",
-		],
-	)
-	return tasks or []
-
-
 def parse_attachment_log(html, type):
-	soup = BeautifulSoup(html, "html.parser")
-	a_tag = soup.find("a")
+	link = get_first_link(html)
 	type = "added" if type == "Attachment" else "removed"
-	if not a_tag:
+	if not link:
 		return {
 			"type": type,
 			"file_name": html.replace("Removed ", ""),
@@ -488,12 +815,12 @@ def parse_attachment_log(html, type):
 		}
 
 	is_private = False
-	if "private/files" in a_tag["href"]:
+	if "private/files" in link["attrs"]["href"]:
 		is_private = True
 
 	return {
 		"type": type,
-		"file_name": a_tag.text,
-		"file_url": a_tag["href"],
+		"file_name": link["text"],
+		"file_url": link["attrs"]["href"],
 		"is_private": is_private,
 	}
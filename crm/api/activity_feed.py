@@ -0,0 +1,289 @@
+import json
+
+import frappe
+
+from crm.api.activities import (
+	ACTIVITY_FEED_READY,
+	CALL_LOG_FIELDS,
+	FILE_FIELDS,
+	NOTE_FIELDS,
+	TASK_FIELDS,
+	get_attachment_log_activity,
+	get_change_activities,
+	get_comment_activity,
+	get_communication_activity,
+	get_version_changes,
+)
+
+TIMELINE_DOCTYPES = ("CRM Lead", "CRM Deal")
+
+# step and last source name synced by an unfinished backfill
+BACKFILL_PROGRESS = "crm_activity_feed_backfill_progress"
+
+# batches synced by each backfill job, well within the long queue timeout
+BACKFILL_JOB_BATCHES = 20
+
+WHATSAPP_FIELDS = [
+	"name",
+	"type",
+	"from",
+	"to",
+	"message",
+	"message_type",
+	"content_type",
+	"attach",
+	"status",
+	"reply_to_message_id",
+	"creation",
+	"owner",
+]
+
+
+def sync(doc, method=None):
+	"""Update CRM Activity entries of a changed or deleted timeline source"""
+	if method == "on_trash":
+		delete_entries(doc.doctype, doc.name)
+		if doc.doctype == "File" and doc.attached_to_doctype in ("Comment", "Communication"):
+			sync_attached_to(doc, exclude=doc.name)
+		return
+
+	handler = {
+		"Version": sync_version,
+		"Comment": sync_comment,
+		"Communication": sync_communication,
+		"File": sync_file,
+		"CRM Call Log": sync_call_log,
+		"FCRM Note": sync_note,
+		"CRM Task": sync_task,
+		"WhatsApp Message": sync_whatsapp_message,
+	}.get(doc.doctype)
+	if handler:
+		handler(doc)
+
+
+def sync_version(doc):
+	if doc.ref_doctype not in TIMELINE_DOCTYPES:
+		return
+
+	# also caches the parsed changes for timelines built from versions
+	changes = get_version_changes(doc.ref_doctype, doc.docname, [doc])[doc.name]
+	activities = get_change_activities(doc, changes, False)
+	if activities:
+		set_entries(doc, [(doc.ref_doctype, doc.docname)], "version", activities)
+
+
+def sync_comment(doc):
+	targets = get_targets([(doc.reference_doctype, doc.reference_name)])
+	if doc.comment_type == "Comment":
+		set_entries(doc, targets, "comment", get_comment_activity(doc, get_files(doc), False))
+	elif doc.comment_type in ("Attachment", "Attachment Removed"):
+		set_entries(doc, targets, "attachment_log", get_attachment_log_activity(doc, False))
+
+
+def sync_communication(doc):
+	if doc.communication_type not in ("Communication", "Automated Message"):
+		return
+
+	links = [(link.link_doctype, link.link_name) for link in doc.get("timeline_links") or []]
+	targets = get_targets([(doc.reference_doctype, doc.reference_name), *links])
+	activity = get_communication_activity(doc, get_files(doc), False)
+	set_entries(doc, targets, "communication", activity)
+
+
+def sync_file(doc):
+	if doc.attached_to_doctype in TIMELINE_DOCTYPES:
+		data = {fieldname: doc.get(fieldname) for fieldname in FILE_FIELDS}
+		set_entries(doc, [(doc.attached_to_doctype, doc.attached_to_name)], "attachment", data)
+	elif doc.attached_to_doctype in ("Comment", "Communication"):
+		sync_attached_to(doc)
+
+
+def sync_attached_to(file, exclude=None):
+	"""Refresh the attachments of the comment or communication `file` is attached to"""
+	if not frappe.db.exists(file.attached_to_doctype, file.attached_to_name):
+		return
+
+	doc = frappe.get_doc(file.attached_to_doctype, file.attached_to_name)
+	doc.flags.exclude_file = exclude
+	sync(doc)
+
+
+def sync_call_log(doc):
+	links = [(link.link_doctype, link.link_name) for link in doc.get("links") or []]
+	targets = get_targets([(doc.reference_doctype, doc.reference_docname), *links])
+	set_entries(doc, targets, "call", {fieldname: doc.get(fieldname) for fieldname in CALL_LOG_FIELDS})
+
+	# notes and tasks of a call show up on the timelines the call is on
+	for link_doctype, link_name in links:
+		if link_doctype in ("FCRM Note", "CRM Task"):
+			fields = NOTE_FIELDS if link_doctype == "FCRM Note" else TASK_FIELDS
+			linked = frappe.db.get_value(link_doctype, link_name, fields, as_dict=True)
+			if linked:
+				activity_type = "note" if link_doctype == "FCRM Note" else "task"
+				set_entries(
+					frappe._dict(doctype=link_doctype, name=link_name, creation=linked.modified),
+					targets,
+					activity_type,
+					linked,
+					exclusive=False,
+				)
+
+
+def sync_note(doc):
+	targets = get_targets([(doc.reference_doctype, doc.reference_docname)])
+	data = {fieldname: doc.get(fieldname) for fieldname in NOTE_FIELDS}
+	set_entries(doc, targets, "note", data, exclusive=False)
+
+
+def sync_task(doc):
+	targets = get_targets([(doc.reference_doctype, doc.reference_docname)])
+	data = {fieldname: doc.get(fieldname) for fieldname in TASK_FIELDS}
+	set_entries(doc, targets, "task", data, exclusive=False)
+
+
+def sync_whatsapp_message(doc):
+	targets = get_targets([(doc.reference_doctype, doc.reference_name)])
+	set_entries(doc, targets, "whatsapp", {fieldname: doc.get(fieldname) for fieldname in WHATSAPP_FIELDS})
+
+
+def get_targets(references):
+	"""Leads and deals among `references`"""
+	targets = []
+	for doctype, name in references:
+		if doctype in TIMELINE_DOCTYPES and name and (doctype, name) not in targets:
+			targets.append((doctype, name))
+	return targets
+
+
+def get_files(doc):
+	"""Files attached to `doc`, except one being deleted"""
+	return frappe.get_all(
+		"File",
+		filters={
+			"attached_to_doctype": doc.doctype,
+			"attached_to_name": doc.name,
+			"name": ("!=", doc.flags.exclude_file or ""),
+		},
+		fields=FILE_FIELDS,
+	)
+
+
+def set_entries(source, targets, activity_type, data, exclusive=True):
+	"""
+	Write the entry of `source` on the timeline of each target.
+
+	:param exclusive: drop entries of `source` on other timelines, notes and tasks
+	        are not exclusive as they also show up on timelines of their calls
+	"""
+	existing = frappe.get_all(
+		"CRM Activity",
+		filters={"source_doctype": source.doctype, "source_name": source.name},
+		fields=["name", "reference_doctype", "reference_name"],
+	)
+
+	values = {
+		"activity_type": activity_type,
+		"activity_date": source.creation,
+		"data": json.dumps(data, default=str),
+	}
+	for entry in existing:
+		if exclusive and (entry.reference_doctype, entry.reference_name) not in targets:
+			frappe.db.delete("CRM Activity", entry.name)
+		else:
+			frappe.db.set_value("CRM Activity", entry.name, values, update_modified=False)
+
+	linked = {(entry.reference_doctype, entry.reference_name) for entry in existing}
+	for reference_doctype, reference_name in targets:
+		if (reference_doctype, reference_name) in linked:
+			continue
+		frappe.get_doc(
+			{
+				"doctype": "CRM Activity",
+				"reference_doctype": reference_doctype,
+				"reference_name": reference_name,
+				"source_doctype": source.doctype,
+				"source_name": source.name,
+				**values,
+			}
+		).db_insert()
+
+
+def delete_entries(source_doctype, source_name):
+	frappe.db.delete("CRM Activity", {"source_doctype": source_doctype, "source_name": source_name})
+
+
+def backfill(batch_size=500, max_batches=None):
+	"""
+	Sync CRM Activity entries of every timeline source.
+
+	Sources are synced in batches ordered by name and the last synced one is
+	saved with every commit, so an interrupted backfill resumes where it
+	stopped. Entries are rewritten in place, running it again on a site with
+	a ready feed keeps timelines whole. Timelines are built from their sources
+	until the first backfill completes.
+
+	:param max_batches: stop after this many batches, the rest is left for the next call
+	:return: whether every source has been synced
+	"""
+	steps = get_backfill_steps()
+	step, last_name = json.loads(frappe.db.get_default(BACKFILL_PROGRESS) or '[0, ""]')
+	batches = 0
+	while step < len(steps):
+		if max_batches and batches >= max_batches:
+			return False
+
+		doctype, query_doctype, filters, fieldname = steps[step]
+		names = frappe.get_all(
+			query_doctype,
+			filters={**filters, fieldname: (">", last_name)},
+			pluck=fieldname,
+			order_by=f"{fieldname} asc",
+			limit=batch_size,
+			distinct=True,
+		)
+		for name in names:
+			sync(frappe.get_doc(doctype, name))
+
+		step, last_name = (step, names[-1]) if len(names) == batch_size else (step + 1, "")
+		frappe.db.set_default(BACKFILL_PROGRESS, json.dumps([step, last_name]))
+		frappe.db.commit()
+		batches += 1
+
+	frappe.db.set_default(BACKFILL_PROGRESS, "")
+	frappe.db.set_default(ACTIVITY_FEED_READY, 1)
+	frappe.db.commit()
+	return True
+
+
+def run_backfill_job():
+	"""Backfill `BACKFILL_JOB_BATCHES` batches, then queue the next job until every source is synced"""
+	if not backfill(max_batches=BACKFILL_JOB_BATCHES):
+		frappe.enqueue(run_backfill_job, queue="long", timeout=3600, enqueue_after_commit=True)
+
+
+def get_backfill_steps():
+	"""
+	Sources synced by `backfill`, in order.
+
+	:return: list of (source doctype, doctype to query, filters, field holding the source name)
+	"""
+	steps = [
+		("Version", "Version", {"ref_doctype": ("in", TIMELINE_DOCTYPES)}, "name"),
+		("Comment", "Comment", {"reference_doctype": ("in", TIMELINE_DOCTYPES)}, "name"),
+		("Communication", "Communication", {"reference_doctype": ("in", TIMELINE_DOCTYPES)}, "name"),
+		(
+			"Communication",
+			"Communication Link",
+			{"link_doctype": ("in", TIMELINE_DOCTYPES), "parenttype": "Communication"},
+			"parent",
+		),
+		("File", "File", {"attached_to_doctype": ("in", TIMELINE_DOCTYPES)}, "name"),
+		("FCRM Note", "FCRM Note", {"reference_doctype": ("in", TIMELINE_DOCTYPES)}, "name"),
+		("CRM Task", "CRM Task", {"reference_doctype": ("in", TIMELINE_DOCTYPES)}, "name"),
+		("CRM Call Log", "CRM Call Log", {}, "name"),
+	]
+	if frappe.db.exists("DocType", "WhatsApp Message"):
+		steps.append(
+			("WhatsApp Message", "WhatsApp Message", {"reference_doctype": ("in", TIMELINE_DOCTYPES)}, "name")
+		)
+	return steps
@@ -2,8 +2,8 @@ from collections.abc import Iterable
 
 import frappe
 from frappe import _
-from bs4 import BeautifulSoup
 from crm.fcrm.doctype.crm_notification.crm_notification import notify_user
+from crm.utils.html_extract import get_mentions
 
 
 def on_update(self, method):
@@ -55,13 +55,7 @@ def notify_mentions(doc):
 def extract_mentions(html):
     if not html:
         return []
-    soup = BeautifulSoup(html, "html.parser")
-    mentions = []
-    for d in soup.find_all("span", attrs={"data-type": "mention"}):
-        mentions.append(
-            frappe._dict(full_name=d.get("data-label"), email=d.get("data-id"))
-        )
-    return mentions
+    return [frappe._dict(mention) for mention in get_mentions(html)]
 
 
 @frappe.whitelist()
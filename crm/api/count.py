@@ -0,0 +1,126 @@
+import hashlib
+import json
+
+import frappe
+from frappe.utils import make_filter_tuple
+
+from crm.utils import clear_cache_version, get_cache_version
+
+# cached counts are dropped on insert, delete and status/owner changes, the ttl
+# only bounds staleness for edits on other filtered fields
+COUNT_CACHE_TTL = 5 * 60
+
+# estimated counts scan at most this many rows before falling back to an approximation
+ESTIMATE_THRESHOLD = 5000
+
+# changes to these fields move records between the most common views
+TRACKED_FIELDS = (
+	"status",
+	"owner",
+	"lead_owner",
+	"deal_owner",
+	"assigned_to",
+	"converted",
+	"reference_doctype",
+	"reference_docname",
+)
+
+
+def get_total_count(doctype, filters, estimated=False):
+	"""
+	Get count of `doctype` records matching `filters` for the current user.
+
+	:param estimated: count at most `ESTIMATE_THRESHOLD` rows and approximate the rest
+	:return: count and whether it is an estimate
+	"""
+	if estimated:
+		return tuple(get_cached(doctype, filters, "estimated", lambda: get_estimated_count(doctype, filters)))
+	return get_cached(doctype, filters, "exact", lambda: get_exact_count(doctype, filters)), False
+
+
+def get_group_counts(doctype, filters, fieldname, expression=None):
+	"""
+	Get counts of `doctype` records matching `filters` per value of `fieldname`.
+
+	:param expression: SQL expression to group by instead of the plain column
+	:return: dict of value and count
+	"""
+	expression = expression or f"`tab{doctype}`.`{fieldname}`"
+
+	def count():
+		counts = frappe.get_list(
+			doctype,
+			filters=filters,
+			fields=[f"{expression} as value", "count(*) as count"],
+			group_by=expression,
+			order_by="count desc",
+		)
+		return [(d.value, d.count) for d in counts]
+
+	return dict(get_cached(doctype, filters, f"group:{expression}", count))
+
+
+def get_cached(doctype, filters, mode, compute):
+	"""Return cached result of `compute` for `doctype` records matching `filters`"""
+	key = get_count_cache_key(doctype, filters, mode)
+	value = frappe.cache().get_value(key)
+	if value is None:
+		value = compute()
+		frappe.cache().set_value(key, value, expires_in_sec=COUNT_CACHE_TTL)
+	return value
+
+
+def get_exact_count(doctype, filters):
+	return frappe.get_list(doctype, filters=filters, fields="count(*) as total_count")[0].total_count
+
+
+def get_estimated_count(doctype, filters):
+	query = frappe.get_list(doctype, filters=filters, fields=["name"], page_length=ESTIMATE_THRESHOLD, run=0)
+	count = frappe.db.sql(f"select count(*) from ({query}) p")[0][0]
+	if count < ESTIMATE_THRESHOLD:
+		return count, False
+
+	# the table estimate only holds for users who can see every record
+	if not filters and not frappe.build_match_conditions(doctype):
+		count = max(count, frappe.db.estimate_count(doctype))
+	return count, True
+
+
+def get_count_cache_key(doctype, filters, mode):
+	filters = normalize_filters(doctype, filters)
+	payload = json.dumps([filters, get_permission_scope(doctype)], default=str, sort_keys=True)
+	digest = hashlib.md5(payload.encode()).hexdigest()
+	return f"crm_count:{doctype}:{get_list_cache_version(doctype)}:{mode}:{digest}"
+
+
+def normalize_filters(doctype, filters):
+	if isinstance(filters, dict):
+		filters = [make_filter_tuple(doctype, key, value) for key, value in filters.items()]
+	filters = [list(f) if isinstance(f, list | tuple) else f for f in filters or []]
+	return sorted(filters, key=lambda f: json.dumps(f, default=str))
+
+
+def get_permission_scope(doctype):
+	"""
+	Identify what the current user is allowed to see in `doctype`.
+
+	Users with the same roles and the same match conditions (user permissions,
+	shared documents, permission query conditions) see the same records, so
+	they can share cached results.
+	"""
+	return [sorted(frappe.get_roles()), frappe.build_match_conditions(doctype)]
+
+
+def get_list_cache_version(doctype):
+	return get_cache_version("crm_list_cache_version", doctype)
+
+
+def clear_list_cache(doctype):
+	"""Invalidate cached counts of `doctype`"""
+	clear_cache_version("crm_list_cache_version", doctype)
+
+
+def on_change(doc, method=None):
+	if method == "on_update" and not any(doc.has_value_changed(f) for f in TRACKED_FIELDS):
+		return
+	clear_list_cache(doc.doctype)
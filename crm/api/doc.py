@@ -1,15 +1,29 @@
 import json
+import time
 
 import frappe
 from frappe import _
 from frappe.custom.doctype.property_setter.property_setter import make_property_setter
 from frappe.model import no_value_fields
 from frappe.model.document import get_controller
-from frappe.utils import make_filter_tuple
+from frappe.utils import add_to_date, get_datetime, make_filter_tuple, now_datetime
 from pypika import Criterion
 
-from crm.api.views import get_views
-from crm.fcrm.doctype.crm_form_script.crm_form_script import get_form_script
+from crm.api.count import get_total_count
+from crm.api.encoding import encode_rows, is_compact, send_response
+from crm.api.group_by import get_group_filters, get_groups
+from crm.api.index_advisor import record_query
+from crm.api.kanban import get_kanban_data
+from crm.api.pagination import get_keyset_page
+from crm.api.snapshot import get_snapshot
+from crm.api.view_meta import STANDARD_FIELDS, get_view_meta
+from crm.fcrm.doctype.crm_assignment.crm_assignment import get_assignment_filter
+from crm.fcrm.doctype.crm_counter.crm_counter import get_counts as get_record_counts
+from crm.fcrm.doctype.crm_counter.crm_counter import set_counts
+
+# more changes than this since the last sync make the client reload the view
+DELTA_PAGE_LENGTH = 100
+DELTA_OVERLAP_SECONDS = 5
 
 
 @frappe.whitelist()
@@ -286,8 +300,19 @@ def get_data(
 	kanban_fields=[],
 	view=None,
 	default_filters=None,
+	cursor=None,
+	count_mode=None,
+	meta_version=None,
+	response_format=None,
 ):
-	custom_view = False
+	"""
+	Get records and view settings for list, group by and kanban views.
+
+	Pass `cursor` (empty for the first page) to switch to keyset pagination: only
+	the next `page_length` records are returned along with `next_cursor`. For
+	kanban views each column can carry its own `cursor`.
+	"""
+	started = time.monotonic()
 	filters = frappe._dict(filters)
 	rows = frappe.parse_json(rows or "[]")
 	columns = frappe.parse_json(columns or "[]")
@@ -296,26 +321,83 @@ def get_data(
 
 	custom_view_name = view.get("custom_view_name") if view else None
 	view_type = view.get("view_type") if view else None
-	group_by_field = view.get("group_by_field") if view else None
 
-	for key in filters:
-		value = filters[key]
-		if isinstance(value, list):
-			if "@me" in value:
-				value[value.index("@me")] = frappe.session.user
-			elif "%@me%" in value:
-				index = [i for i, v in enumerate(value) if v == "%@me%"]
-				for i in index:
-					value[i] = "%" + frappe.session.user + "%"
-		elif value == "@me":
-			filters[key] = frappe.session.user
+	replace_me_in_filters(filters)
 
 	if default_filters:
 		default_filters = frappe.parse_json(default_filters)
 		filters.update(default_filters)
+	# the index advisor looks at the filters as sent, not at the assignment lookup
+	query_filters = frappe._dict(filters)
+	rewrite_assign_filter(doctype, filters)
+
+	# snapshots only hold first pages, later pages are cheap keyset reads
+	view_args = [filters, order_by, page_length, page_length_count, column_field, title_field]
+	view_args += [columns, rows, kanban_columns, kanban_fields, view, count_mode]
+
+	def compute():
+		return get_view_data(doctype, *view_args, cursor=cursor)
+
+	if cursor is None:
+		response = get_snapshot(doctype, custom_view_name, view_args, compute)
+	else:
+		response = compute()
+
+	view_meta = get_view_meta(doctype)
+	response.update(
+		{
+			"fields": view_meta["fields"],
+			"views": view_meta["views"],
+			"form_script": view_meta["form_script"],
+			"list_script": view_meta["list_script"],
+			"meta_version": view_meta["version"],
+		}
+	)
+	data = response["data"]
+
+	if meta_version and meta_version == view_meta["version"]:
+		# client already has this bundle, send only the rows
+		for key in ("fields", "views", "form_script", "list_script"):
+			response.pop(key)
+		response["meta_unchanged"] = True
+
+	record_query(doctype, query_filters, order_by, view.get("group_by_field") if view else None, started)
+
+	if is_compact(response_format):
+		if view_type == "kanban":
+			for column in data:
+				column["data"] = encode_rows(column["data"])
+		else:
+			response["data"] = encode_rows(data)
+
+	return send_response(response, response_format)
+
+
+def get_view_data(
+	doctype,
+	filters,
+	order_by,
+	page_length,
+	page_length_count,
+	column_field,
+	title_field,
+	columns,
+	rows,
+	kanban_columns,
+	kanban_fields,
+	view,
+	count_mode,
+	cursor=None,
+):
+	"""Get records, counts and columns of a view, without view metadata"""
+	custom_view = False
+	custom_view_name = view.get("custom_view_name") if view else None
+	view_type = view.get("view_type") if view else None
+	group_by_field = view.get("group_by_field") if view else None
 
 	is_default = True
 	data = []
+	next_cursor = None
 	_list = get_controller(doctype)
 	default_rows = []
 	if hasattr(_list, "default_list_data"):
@@ -373,16 +455,19 @@ def get_data(
 		if group_by_field and group_by_field not in rows:
 			rows.append(group_by_field)
 
-		data = (
-			frappe.get_list(
-				doctype,
-				fields=rows,
-				filters=filters,
-				order_by=order_by,
-				page_length=page_length,
+		if cursor is not None:
+			data, next_cursor = get_keyset_page(doctype, rows, filters, order_by, page_length, cursor)
+		else:
+			data = (
+				frappe.get_list(
+					doctype,
+					fields=rows,
+					filters=filters,
+					order_by=order_by,
+					page_length=page_length,
+				)
+				or []
 			)
-			or []
-		)
 		data = parse_list_data(data, doctype)
 
 	if view_type == "kanban":
@@ -417,132 +502,53 @@ def get_data(
 			if field not in rows:
 				rows.append(field)
 
-		for kc in kanban_columns:
-			# Start with base filters
-			column_filters = []
-
-			# Convert and add the main filters first
-			if filters:
-				base_filters = convert_filter_to_tuple(doctype, filters)
-				column_filters.extend(base_filters)
-
-			# Add the column-specific filter
-			if column_field and kc.get("name"):
-				column_filters.append([doctype, column_field, "=", kc.get("name")])
-
-			order = kc.get("order")
-			if kc.get("delete"):
-				column_data = []
-			else:
-				page_length = kc.get("page_length", 20)
-
-				if order:
-					column_data = get_records_based_on_order(
-						doctype, rows, column_filters, page_length, order
-					)
-				else:
-					column_data = frappe.get_list(
-						doctype,
-						fields=rows,
-						filters=column_filters,
-						order_by=order_by,
-						page_length=page_length,
-					)
-
-				all_count = frappe.get_list(
-					doctype,
-					filters=column_filters,
-					fields="count(*) as total_count",
-				)[0].total_count
-
-				kc["all_count"] = all_count
-				kc["count"] = len(column_data)
-
-			if order:
-				column_data = sorted(
-					column_data,
-					key=lambda x: order.index(x.get("name")) if x.get("name") in order else len(order),
-				)
-
-			data.append({"column": kc, "fields": kanban_fields, "data": column_data})
-
-	fields = frappe.get_meta(doctype).fields
-	fields = [field for field in fields if field.fieldtype not in no_value_fields]
-	fields = [
-		{
-			"label": _(field.label),
-			"fieldtype": field.fieldtype,
-			"fieldname": field.fieldname,
-			"options": field.options,
-		}
-		for field in fields
-		if field.label and field.fieldname
-	]
-
-	std_fields = [
-		{"label": "Name", "fieldtype": "Data", "fieldname": "name"},
-		{"label": "Created On", "fieldtype": "Datetime", "fieldname": "creation"},
-		{"label": "Last Modified", "fieldtype": "Datetime", "fieldname": "modified"},
-		{
-			"label": "Modified By",
-			"fieldtype": "Link",
-			"fieldname": "modified_by",
-			"options": "User",
-		},
-		{"label": "Assigned To", "fieldtype": "Text", "fieldname": "_assign"},
-		{"label": "Owner", "fieldtype": "Link", "fieldname": "owner", "options": "User"},
-		{"label": "Like", "fieldtype": "Data", "fieldname": "_liked_by"},
-	]
+		data = get_kanban_data(
+			doctype,
+			rows,
+			convert_filter_to_tuple(doctype, filters) if filters else [],
+			order_by,
+			column_field,
+			kanban_columns,
+			kanban_fields,
+			cursor,
+			count_mode == "estimated",
+		)
+		# badges on the cards of every column
+		set_counts(doctype, [record for column in data for record in column["data"]])
 
-	for field in std_fields:
+	for field in STANDARD_FIELDS:
 		if field.get("fieldname") not in rows:
 			rows.append(field.get("fieldname"))
-		if field not in fields:
-			field["label"] = _(field["label"])
-			fields.append(field)
+
+	total_count, total_count_estimated = get_total_count(doctype, filters, count_mode == "estimated")
 
 	if not is_default and custom_view_name:
 		is_default = frappe.db.get_value("CRM View Settings", custom_view_name, "load_default_columns")
 
 	if group_by_field and view_type == "group_by":
+		group_by_bucket = view.get("group_by_bucket") if view else None
+		groups = get_groups(doctype, filters, group_by_field, order_by, group_by_bucket)
 
 		def get_options(type, options):
-			if type == "Select":
+			if type == "Select" and not group_by_bucket:
 				return [option for option in options.split("\n")]
-			else:
-				has_empty_values = any([not d.get(group_by_field) for d in data])
-				options = list(set([d.get(group_by_field) for d in data]))
-				options = [u for u in options if u]
-				if has_empty_values:
-					options.append("")
-
-				if order_by and group_by_field in order_by:
-					order_by_fields = order_by.split(",")
-					order_by_fields = [
-						(field.split(" ")[0], field.split(" ")[1]) for field in order_by_fields
-					]
-					if (group_by_field, "asc") in order_by_fields:
-						options.sort()
-					elif (group_by_field, "desc") in order_by_fields:
-						options.sort(reverse=True)
-				else:
-					options.sort()
-				return options
-
-		for field in fields:
+			return [group["value"] for group in groups]
+
+		for field in get_view_meta(doctype)["fields"]:
 			if field.get("fieldname") == group_by_field:
 				group_by_field = {
 					"label": field.get("label"),
 					"fieldname": field.get("fieldname"),
 					"fieldtype": field.get("fieldtype"),
 					"options": get_options(field.get("fieldtype"), field.get("options")),
+					"groups": groups,
+					"bucket": group_by_bucket,
 				}
 
-	return {
+	response = {
 		"data": data,
 		"columns": columns,
 		"rows": rows,
-		"fields": fields,
 		"column_field": column_field,
 		"title_field": title_field,
 		"kanban_columns": kanban_columns,
@@ -551,16 +557,151 @@ def get_data(
 		"page_length": page_length,
 		"page_length_count": page_length_count,
 		"is_default": is_default,
-		"views": get_views(doctype),
-		"total_count": frappe.get_list(doctype, filters=filters, fields="count(*) as total_count")[
-			0
-		].total_count,
+		"total_count": total_count,
+		"total_count_estimated": total_count_estimated,
 		"row_count": len(data),
-		"form_script": get_form_script(doctype),
-		"list_script": get_form_script(doctype, "List"),
+		"next_cursor": next_cursor,
 		"view_type": view_type,
 	}
 
+	return response
+
+
+@frappe.whitelist()
+def get_group_data(
+	doctype: str,
+	filters: dict,
+	group_by_field: str,
+	value=None,
+	order_by=None,
+	rows=None,
+	page_length=20,
+	cursor=None,
+	bucket=None,
+	response_format=None,
+):
+	"""
+	Get records of a single group of a group by view, paginated with a cursor.
+
+	:param value: group value as returned in `group_by_field.groups` by `get_data`
+	:param bucket: date bucket (day, month or year) the groups were built with
+	"""
+	filters = frappe._dict(frappe.parse_json(filters or "{}"))
+	replace_me_in_filters(filters)
+	rewrite_assign_filter(doctype, filters)
+	rows = frappe.parse_json(rows or '["name"]')
+	if group_by_field not in rows:
+		rows.append(group_by_field)
+
+	filters = convert_filter_to_tuple(doctype, filters)
+	filters += get_group_filters(doctype, group_by_field, value, bucket)
+
+	data, next_cursor = get_keyset_page(doctype, rows, filters, order_by, page_length, cursor)
+	data = parse_list_data(data, doctype)
+	if is_compact(response_format):
+		data = encode_rows(data)
+	return send_response({"data": data, "next_cursor": next_cursor}, response_format)
+
+
+@frappe.whitelist()
+def get_data_delta(
+	doctype: str,
+	filters: dict,
+	since: str,
+	rows=None,
+	names=None,
+	default_filters=None,
+	response_format=None,
+):
+	"""
+	Get changes to a list view since the `since` watermark, to patch it in place.
+
+	:param since: watermark returned by the previous call
+	:param rows: fields to fetch for changed records
+	:param names: names of the records currently shown by the client
+	:return: `data` with records that changed or entered the view, `removed` with the
+	        `names` that left the view or were deleted and the next `watermark`. `reset` is set when
+	        too much has changed and the view should be reloaded instead.
+	"""
+	filters = frappe._dict(frappe.parse_json(filters or "{}"))
+	replace_me_in_filters(filters)
+	if default_filters:
+		filters.update(frappe.parse_json(default_filters))
+	rewrite_assign_filter(doctype, filters)
+
+	rows = frappe.parse_json(rows or '["name"]')
+	for fieldname in ("name", "modified"):
+		if fieldname not in rows:
+			rows.append(fieldname)
+	names = frappe.parse_json(names or "[]")
+
+	# overlap with the previous window so records saved while it was read are not
+	# missed, clients apply the same change twice without harm
+	watermark = add_to_date(now_datetime(), seconds=-DELTA_OVERLAP_SECONDS)
+
+	filters = convert_filter_to_tuple(doctype, filters)
+	data = frappe.get_list(
+		doctype,
+		fields=rows,
+		filters=[*filters, [doctype, "modified", ">", get_datetime(since)]],
+		order_by="modified asc",
+		page_length=DELTA_PAGE_LENGTH + 1,
+	)
+	if len(data) > DELTA_PAGE_LENGTH:
+		return {"reset": True, "watermark": watermark}
+
+	# deleted records are among the shown records the user can no longer see, names
+	# of other deleted records are not reported as they may never have been visible
+	removed = []
+	if names:
+		visible = frappe.get_list(doctype, filters=[*filters, [doctype, "name", "in", names]], pluck="name")
+		removed = [name for name in names if name not in visible]
+
+	data = parse_list_data(data, doctype)
+	if is_compact(response_format):
+		data = encode_rows(data)
+
+	response = {"data": data, "removed": list(dict.fromkeys(removed)), "watermark": watermark}
+	return send_response(response, response_format)
+
+
+def replace_me_in_filters(filters):
+	for key in filters:
+		value = filters[key]
+		if isinstance(value, list):
+			if "@me" in value:
+				value[value.index("@me")] = frappe.session.user
+			elif "%@me%" in value:
+				index = [i for i, v in enumerate(value) if v == "%@me%"]
+				for i in index:
+					value[i] = "%" + frappe.session.user + "%"
+		elif value == "@me":
+			filters[key] = frappe.session.user
+
+
+def rewrite_assign_filter(doctype, filters):
+	"""
+	Replace a `like` filter on `_assign` with a `name` lookup in the assignment index.
+
+	`_assign` holds a JSON list, so matching a user in it scans every row.
+	"""
+	value = filters.get("_assign")
+	if "name" in filters or not isinstance(value, list) or len(value) != 2:
+		return
+
+	operator, pattern = value
+	if operator not in ("like", "not like") or not isinstance(pattern, str):
+		return
+
+	user = pattern.strip("%").strip('"')
+	if not user or "%" in user:
+		return
+
+	assignment_filter = get_assignment_filter(doctype, user, negate=operator == "not like")
+	if assignment_filter:
+		del filters["_assign"]
+		filters["name"] = assignment_filter[2:]
+
 
 def parse_list_data(data, doctype):
 	_list = get_controller(doctype)
@@ -578,35 +719,6 @@ def convert_filter_to_tuple(doctype, filters):
 	return filters
 
 
-def get_records_based_on_order(doctype, rows, filters, page_length, order):
-	records = []
-	filters = convert_filter_to_tuple(doctype, filters)
-	in_filters = filters.copy()
-	in_filters.append([doctype, "name", "in", order[:page_length]])
-	records = frappe.get_list(
-		doctype,
-		fields=rows,
-		filters=in_filters,
-		order_by="creation desc",
-		page_length=page_length,
-	)
-
-	if len(records) < page_length:
-		not_in_filters = filters.copy()
-		not_in_filters.append([doctype, "name", "not in", order])
-		remaining_records = frappe.get_list(
-			doctype,
-			fields=rows,
-			filters=not_in_filters,
-			order_by="creation desc",
-			page_length=page_length - len(records),
-		)
-		for record in remaining_records:
-			records.append(record)
-
-	return records
-
-
 @frappe.whitelist()
 def get_fields_meta(doctype, restricted_fieldtypes=None, as_array=False, only_required=False):
 	not_allowed_fieldtypes = [
@@ -695,34 +807,14 @@ def get_fields(doctype: str, allow_all_fieldtypes: bool = False):
 	return _fields
 
 
-def getCounts(d, doctype):
-	d["_email_count"] = (
-		frappe.db.count(
-			"Communication",
-			filters={
-				"reference_doctype": doctype,
-				"reference_name": d.get("name"),
-				"communication_type": "Communication",
-			},
-		)
-		or 0
-	)
-	d["_email_count"] = d["_email_count"] + frappe.db.count(
-		"Communication",
-		filters={
-			"reference_doctype": doctype,
-			"reference_name": d.get("name"),
-			"communication_type": "Automated Message",
-		},
-	)
-	d["_comment_count"] = frappe.db.count(
-		"Comment",
-		filters={"reference_doctype": doctype, "reference_name": d.get("name"), "comment_type": "Comment"},
-	)
-	d["_task_count"] = frappe.db.count(
-		"CRM Task", filters={"reference_doctype": doctype, "reference_docname": d.get("name")}
-	)
-	d["_note_count"] = frappe.db.count(
-		"FCRM Note", filters={"reference_doctype": doctype, "reference_docname": d.get("name")}
-	)
-	return d
+@frappe.whitelist()
+def get_counts(doctype: str, names):
+	"""
+	Email, comment, task and note counts of a page of leads or deals.
+
+	:param names: names of the records, those the user cannot read are left out
+	:return: counts keyed by name
+	"""
+	names = frappe.parse_json(names)
+	permitted = frappe.get_list(doctype, filters={"name": ("in", names)}, pluck="name") if names else []
+	return get_record_counts(doctype, permitted)
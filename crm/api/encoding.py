@@ -0,0 +1,97 @@
+import datetime
+
+import frappe
+from frappe import _
+
+RESPONSE_FORMATS = ("json", "compact", "msgpack")
+
+
+def encode_rows(rows):
+	"""
+	Encode a list of dicts into a compact columnar payload.
+
+	Keys are sent once in `columns` and each row becomes a positional list in
+	`values`. Date and datetime columns are sent as strings, the same way they
+	appear in JSON responses, and are listed in `types` so clients can parse them
+	once per column. Keys missing from a row are listed per row index in `absent`.
+
+	:param rows: list of dicts
+	:return: dict with `columns`, `types`, `values` and `absent`
+	"""
+	columns = []
+	for row in rows:
+		for key in row:
+			if key not in columns:
+				columns.append(key)
+
+	types = {}
+	values = []
+	absent = {}
+	for i, row in enumerate(rows):
+		encoded = []
+		for j, key in enumerate(columns):
+			if key not in row:
+				absent.setdefault(str(i), []).append(j)
+				encoded.append(None)
+				continue
+
+			value = row[key]
+			if isinstance(value, datetime.datetime | datetime.date | datetime.time | datetime.timedelta):
+				types[key] = get_value_type(value)
+				value = str(value)
+			encoded.append(value)
+		values.append(encoded)
+
+	return {"columns": columns, "types": types, "values": values, "absent": absent}
+
+
+def decode_rows(payload):
+	"""Decode a payload built by `encode_rows` back into a list of dicts"""
+	columns = payload["columns"]
+	absent = payload.get("absent") or {}
+	rows = []
+	for i, values in enumerate(payload["values"]):
+		skip = absent.get(str(i), [])
+		rows.append(
+			{key: value for j, (key, value) in enumerate(zip(columns, values, strict=True)) if j not in skip}
+		)
+	return rows
+
+
+def get_value_type(value):
+	if isinstance(value, datetime.datetime):
+		return "datetime"
+	if isinstance(value, datetime.date):
+		return "date"
+	if isinstance(value, datetime.time):
+		return "time"
+	return "duration"
+
+
+def validate_response_format(response_format):
+	if response_format and response_format not in RESPONSE_FORMATS:
+		frappe.throw(_("Invalid response format: {0}").format(response_format))
+
+
+def is_compact(response_format):
+	validate_response_format(response_format)
+	return response_format in ("compact", "msgpack")
+
+
+def send_response(response, response_format=None):
+	"""
+	Return `response` as is, or send it as a msgpack body when asked for.
+
+	msgpack is optional, requesting it without the package installed is an error.
+	"""
+	if response_format != "msgpack":
+		return response
+
+	try:
+		import msgpack
+	except ImportError:
+		frappe.throw(_("msgpack is not installed on this site"))
+
+	frappe.local.response.filename = "response.msgpack"
+	frappe.local.response.filecontent = msgpack.packb(response, default=str)
+	frappe.local.response.type = "binary"
@@ -0,0 +1,148 @@
+import contextlib
+import csv
+
+import frappe
+from frappe import _
+from frappe.utils import scrub
+from openpyxl import Workbook
+
+from crm.api.count import get_total_count
+from crm.api.doc import replace_me_in_filters, rewrite_assign_filter
+
+EXPORT_FORMATS = ("CSV", "Excel")
+
+# rows written between two progress events
+PROGRESS_INTERVAL = 5000
+
+
+@frappe.whitelist()
+def export_view(
+	doctype: str,
+	view=None,
+	filters=None,
+	columns=None,
+	order_by=None,
+	file_format="CSV",
+):
+	"""
+	Export every record of a view to a private CSV or Excel file in a background job.
+
+	Progress is published as `crm_export_progress` realtime events, the last one
+	carries the `file_url` of the export.
+
+	:param view: name of a CRM View Settings to export, `filters`, `columns` and `order_by` override it
+	:param columns: columns as stored in CRM View Settings, dicts with `label` and `key`
+	:return: id of the export
+	"""
+	if file_format not in EXPORT_FORMATS:
+		frappe.throw(_("Invalid export format: {0}").format(file_format))
+
+	if not frappe.has_permission(doctype, "export"):
+		frappe.throw(_("Not permitted to export {0}").format(doctype), frappe.PermissionError)
+
+	if view:
+		settings = frappe.get_doc("CRM View Settings", view)
+		settings.check_permission("read")
+		filters = filters or settings.filters
+		columns = columns or settings.columns
+		order_by = order_by or settings.order_by
+
+	filters = frappe._dict(frappe.parse_json(filters or "{}"))
+	replace_me_in_filters(filters)
+	rewrite_assign_filter(doctype, filters)
+	columns = frappe.parse_json(columns or "[]") or [{"label": "Name", "key": "name"}]
+
+	export_id = frappe.generate_hash(length=10)
+	frappe.enqueue(
+		build_export,
+		queue="long",
+		timeout=60 * 60,
+		export_id=export_id,
+		doctype=doctype,
+		filters=filters,
+		columns=columns,
+		order_by=order_by,
+		file_format=file_format,
+	)
+	return export_id
+
+
+def build_export(export_id, doctype, filters, columns, order_by, file_format):
+	"""
+	Stream records into an export file.
+
+	Rows are read with an unbuffered cursor and written as they arrive, so memory
+	use does not grow with the number of exported records.
+	"""
+	fields = [column.get("key") for column in columns]
+	total = get_total_count(doctype, filters)[0]
+	query = frappe.get_list(doctype, fields=fields, filters=filters, order_by=order_by, run=0)
+
+	extension = "csv" if file_format == "CSV" else "xlsx"
+	file_name = f"{scrub(doctype)}-export-{export_id}.{extension}"
+	path = frappe.get_site_path("private", "files", file_name)
+
+	writer = CSVWriter(path) if file_format == "CSV" else ExcelWriter(path, doctype)
+	writer.write([_(column.get("label") or column.get("key")) for column in columns])
+
+	count = 0
+	with get_unbuffered_cursor():
+		for row in frappe.db.sql(query, as_iterator=True):
+			writer.write(row)
+			count += 1
+			if count % PROGRESS_INTERVAL == 0:
+				publish_progress(export_id, count, total)
+	writer.close()
+
+	file = frappe.get_doc(
+		{
+			"doctype": "File",
+			"file_name": file_name,
+			"file_url": f"/private/files/{file_name}",
+			"is_private": 1,
+		}
+	).insert(ignore_permissions=True)
+
+	publish_progress(export_id, count, total, file.file_url)
+
+
+def get_unbuffered_cursor():
+	# only MariaDB streams rows from the server, other databases read them in one go
+	if hasattr(frappe.db, "unbuffered_cursor"):
+		return frappe.db.unbuffered_cursor()
+	return contextlib.nullcontext()
+
+
+def publish_progress(export_id, count, total, file_url=None):
+	frappe.publish_realtime(
+		"crm_export_progress",
+		{"export_id": export_id, "count": count, "total": total, "file_url": file_url},
+		user=frappe.session.user,
+	)
+
+
+class CSVWriter:
+	def __init__(self, path):
+		self.file = open(path, "w", newline="", encoding="utf-8")
+		self.writer = csv.writer(self.file)
+
+	def write(self, row):
+		self.writer.writerow(row)
+
+	def close(self):
+		self.file.close()
+
+
+class ExcelWriter:
+	"""Write an xlsx file row by row, openpyxl's write-only mode keeps no rows in memory"""
+
+	def __init__(self, path, sheet_name):
+		self.path = path
+		self.workbook = Workbook(write_only=True)
+		self.sheet = self.workbook.create_sheet(sheet_name[:31])
+
+	def write(self, row):
+		self.sheet.append(list(row))
+
+	def close(self):
+		self.workbook.save(self.path)
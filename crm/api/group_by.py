@@ -0,0 +1,116 @@
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, get_datetime, getdate
+
+from crm.api.count import get_cached, get_group_counts, get_total_count
+from crm.fcrm.doctype.crm_assignment.crm_assignment import get_assignment_filter, is_index_ready
+
+DATE_BUCKETS = {
+	# bucket: (mariadb format, postgres format)
+	"day": ("%Y-%m-%d", "YYYY-MM-DD"),
+	"month": ("%Y-%m", "YYYY-MM"),
+	"year": ("%Y", "YYYY"),
+}
+
+
+def get_groups(doctype, filters, group_by_field, order_by=None, bucket=None):
+	"""
+	Get every group of `doctype` records matching `filters` with its count.
+
+	Link, Select and other plain fields are grouped by value, `_assign` by
+	assigned user and Date/Datetime fields by `bucket` (day, month or year).
+
+	:return: list of dicts with `value` and `count`, `""` stands for records without a value
+	"""
+	if group_by_field == "_assign":
+		counts = get_assignment_counts(doctype, filters)
+	else:
+		counts = get_group_counts(
+			doctype, filters, group_by_field, get_group_expression(doctype, group_by_field, bucket)
+		)
+
+	groups = {}
+	for value, count in counts.items():
+		value = "" if value is None else value
+		groups[value] = groups.get(value, 0) + count
+
+	reverse = bool(order_by and f"{group_by_field} desc" in order_by)
+	values = sorted([v for v in groups if v != ""], key=str, reverse=reverse)
+	if "" in groups:
+		values.append("")
+	return [{"value": value, "count": groups[value]} for value in values]
+
+
+def get_group_expression(doctype, fieldname, bucket=None):
+	if not bucket:
+		return None
+
+	if bucket not in DATE_BUCKETS:
+		frappe.throw(_("Invalid date bucket: {0}").format(bucket))
+
+	field = frappe.get_meta(doctype).get_field(fieldname)
+	if fieldname not in ("creation", "modified") and (
+		not field or field.fieldtype not in ("Date", "Datetime")
+	):
+		frappe.throw(_("Only Date and Datetime fields can be grouped by {0}").format(bucket))
+
+	mariadb_format, postgres_format = DATE_BUCKETS[bucket]
+	if frappe.db.db_type == "postgres":
+		return f"to_char(`tab{doctype}`.`{fieldname}`, '{postgres_format}')"
+	return f"date_format(`tab{doctype}`.`{fieldname}`, '{mariadb_format}')"
+
+
+def get_assignment_counts(doctype, filters):
+	"""Count records matching `filters` per assigned user, unassigned records are counted under `None`"""
+	if not is_index_ready():
+		return get_assign_field_counts(doctype, filters)
+
+	def count():
+		subquery = frappe.get_list(doctype, filters=filters, fields=["name"], order_by=None, run=0)
+		assignments = f"""
+			from `tabCRM Assignment`
+			where reference_doctype = {frappe.db.escape(doctype)}
+				and reference_name in ({subquery})
+		"""
+		counts = frappe.db.sql(f"select user, count(distinct reference_name) {assignments} group by user")
+		assigned = frappe.db.sql(f"select count(distinct reference_name) {assignments}")[0][0]
+		unassigned = get_total_count(doctype, filters)[0] - assigned
+		return [*[tuple(c) for c in counts], (None, unassigned)]
+
+	return dict(get_cached(doctype, filters, "group:_assign", count))
+
+
+def get_group_filters(doctype, group_by_field, value, bucket=None):
+	"""Filters selecting the records of a single group returned by `get_groups`"""
+	if group_by_field == "_assign":
+		if not value:
+			# unassigned records have no value or an empty json list
+			return [[doctype, "_assign", "not like", '%"%']]
+		return [get_assignment_filter(doctype, value) or [doctype, "_assign", "like", f'%"{value}"%']]
+
+	if not value:
+		return [[doctype, group_by_field, "is", "not set"]]
+
+	if bucket:
+		start = getdate(value + {"day": "", "month": "-01", "year": "-01-01"}[bucket])
+		end = add_to_date(start, **{f"{bucket}s": 1})
+		field = frappe.get_meta(doctype).get_field(group_by_field)
+		if field and field.fieldtype == "Date":
+			return [[doctype, group_by_field, ">=", start], [doctype, group_by_field, "<", end]]
+		return [
+			[doctype, group_by_field, ">=", get_datetime(start)],
+			[doctype, group_by_field, "<", get_datetime(end)],
+		]
+
+	return [[doctype, group_by_field, "=", value]]
+
+
+def get_assign_field_counts(doctype, filters):
+	"""Count records per assigned user from the `_assign` lists, used until the assignment index is filled"""
+	counts = {}
+	for value, count in get_group_counts(doctype, filters, "_assign").items():
+		for user in json.loads(value or "[]") or [None]:
+			counts[user] = counts.get(user, 0) + count
+	return counts
@@ -0,0 +1,286 @@
+import json
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import make_filter_tuple
+
+# doctypes whose list queries are recorded and indexed
+ADVISED_DOCTYPES = ("CRM Lead", "CRM Deal", "CRM Task", "CRM Call Log")
+
+QUERY_PATTERNS_KEY = "crm_query_patterns"
+
+# operators an index can serve as an equality lookup or as a range scan
+EQUALITY_OPERATORS = ("=", "in", "is")
+RANGE_OPERATORS = (">", "<", ">=", "<=", "between", "timespan")
+
+# columns of these types cannot be indexed without a prefix length
+UNINDEXABLE_FIELDTYPES = ("Text", "Small Text", "Long Text", "Text Editor", "Code", "HTML Editor", "JSON")
+
+MAX_INDEX_COLUMNS = 3
+
+
+def record_query(doctype, filters, order_by, group_by_field, started):
+	"""
+	Record the signature and latency of a list query.
+
+	Signatures keep filtered fields with their operator and the sort order but
+	not the filter values, one sample of the values is kept to explain the query.
+
+	:param started: `time.monotonic()` value taken when the query started
+	"""
+	if doctype not in ADVISED_DOCTYPES:
+		return
+
+	duration = time.monotonic() - started
+	signature = get_signature(doctype, filters, order_by, group_by_field)
+	key = json.dumps(signature, sort_keys=True)
+
+	stats = frappe.cache().hget(QUERY_PATTERNS_KEY, key) or {
+		"signature": signature,
+		"count": 0,
+		"total_time": 0,
+		"max_time": 0,
+	}
+	stats["count"] += 1
+	stats["total_time"] += duration
+	stats["max_time"] = max(stats["max_time"], duration)
+	stats["sample_filters"] = filters
+	stats["sample_order_by"] = order_by
+	frappe.cache().hset(QUERY_PATTERNS_KEY, key, stats)
+
+
+def get_signature(doctype, filters, order_by, group_by_field=None):
+	if isinstance(filters, dict):
+		filters = [make_filter_tuple(doctype, key, value) for key, value in filters.items()]
+
+	conditions = set()
+	for f in filters or []:
+		if isinstance(f, list | tuple) and len(f) >= 3:
+			fieldname, operator, value = f[-3], str(f[-2]).lower(), f[-1]
+			conditions.add((fieldname, get_operator_class(operator, value)))
+
+	sort = []
+	for part in (order_by or "").split(","):
+		tokens = part.strip().split()
+		if tokens:
+			sort.append(
+				[tokens[0].split(".")[-1].strip("`"), tokens[1].lower() if len(tokens) > 1 else "asc"]
+			)
+
+	return {
+		"doctype": doctype,
+		"filters": sorted([list(c) for c in conditions]),
+		"order_by": sort,
+		"group_by": group_by_field,
+	}
+
+
+def get_operator_class(operator, value):
+	if operator in EQUALITY_OPERATORS:
+		return "equality"
+	if operator in RANGE_OPERATORS:
+		return "range"
+	if operator == "like" and isinstance(value, str) and not value.startswith("%"):
+		# a prefix match can use an index like a range
+		return "range"
+	return "scan"
+
+
+def get_query_patterns(doctype=None):
+	"""Recorded query patterns together with the filters and sort order of saved views"""
+	patterns = {}
+	for key, stats in (frappe.cache().hgetall(QUERY_PATTERNS_KEY) or {}).items():
+		key = key.decode() if isinstance(key, bytes) else key
+		patterns[key] = stats
+
+	views = frappe.get_all(
+		"CRM View Settings",
+		filters={"dt": ("in", ADVISED_DOCTYPES)},
+		fields=["dt", "filters", "order_by", "group_by_field"],
+	)
+	for view in views:
+		filters = frappe.parse_json(view.filters or "{}")
+		signature = get_signature(view.dt, filters, view.order_by, view.group_by_field)
+		key = json.dumps(signature, sort_keys=True)
+		patterns.setdefault(
+			key,
+			{
+				"signature": signature,
+				"count": 0,
+				"total_time": 0,
+				"max_time": 0,
+				"sample_filters": filters,
+				"sample_order_by": view.order_by,
+			},
+		)
+		patterns[key]["saved_view"] = True
+
+	return [p for p in patterns.values() if not doctype or p["signature"]["doctype"] == doctype]
+
+
+def get_index_columns(signature):
+	"""
+	Pick composite index columns for a query signature.
+
+	Columns follow the equality, sort, range order: equality filters first so
+	the index narrows down to the matching rows, then the sort columns so rows
+	come out already ordered, then one range filter.
+	"""
+	meta = frappe.get_meta(signature["doctype"])
+
+	def indexable(fieldname):
+		if fieldname in ("name", "owner", "creation", "modified", "modified_by"):
+			return True
+		field = meta.get_field(fieldname)
+		return bool(field) and field.fieldtype not in UNINDEXABLE_FIELDTYPES
+
+	filters = [f for f in signature["filters"] if indexable(f[0])]
+	columns = [fieldname for fieldname, kind in filters if kind == "equality"]
+
+	sort = signature.get("order_by") or []
+	if signature.get("group_by"):
+		sort = [[signature["group_by"], "asc"], *sort]
+	for fieldname, _direction in sort:
+		if indexable(fieldname) and fieldname != "name" and fieldname not in columns:
+			columns.append(fieldname)
+
+	for fieldname, kind in filters:
+		if kind == "range" and fieldname not in columns:
+			columns.append(fieldname)
+			break
+
+	return columns[:MAX_INDEX_COLUMNS]
+
+
+def get_existing_indexes(doctype):
+	"""Return columns of every index on `doctype` in index order"""
+	table = f"tab{doctype}"
+	if frappe.db.db_type == "postgres":
+		rows = frappe.db.sql(
+			"""
+			select i.relname, a.attname, array_position(ix.indkey::int2[], a.attnum) as seq
+			from pg_class t
+			join pg_index ix on t.oid = ix.indrelid
+			join pg_class i on i.oid = ix.indexrelid
+			join pg_attribute a on a.attrelid = t.oid and a.attnum = any(ix.indkey)
+			where t.relname = %s
+			order by i.relname, seq
+			""",
+			table,
+		)
+	else:
+		rows = [
+			(r.Key_name, r.Column_name, r.Seq_in_index)
+			for r in frappe.db.sql(f"show index from `{table}`", as_dict=True)
+		]
+
+	indexes = {}
+	for index_name, column, _seq in sorted(rows, key=lambda r: (r[0], r[2])):
+		indexes.setdefault(index_name, []).append(column)
+	return indexes
+
+
+def is_covered(columns, indexes):
+	return any(index[: len(columns)] == columns for index in indexes.values())
+
+
+@frappe.whitelist()
+def get_index_recommendations(doctype=None):
+	"""
+	Recommend composite indexes for recorded list queries and saved views.
+
+	:return: recommendations sorted by the time spent on matching queries
+	"""
+	frappe.only_for("System Manager")
+
+	recommendations = {}
+	for pattern in get_query_patterns(doctype):
+		dt = pattern["signature"]["doctype"]
+		columns = get_index_columns(pattern["signature"])
+		if not columns:
+			continue
+
+		key = (dt, tuple(columns))
+		recommendation = recommendations.setdefault(
+			key,
+			{
+				"doctype": dt,
+				"columns": columns,
+				"index_name": get_index_name(columns),
+				"count": 0,
+				"total_time": 0,
+				"max_time": 0,
+				"saved_view": False,
+				"signatures": [],
+			},
+		)
+		recommendation["count"] += pattern["count"]
+		recommendation["total_time"] += pattern["total_time"]
+		recommendation["max_time"] = max(recommendation["max_time"], pattern["max_time"])
+		recommendation["saved_view"] = recommendation["saved_view"] or pattern.get("saved_view", False)
+		recommendation["signatures"].append(pattern["signature"])
+
+	existing = {}
+	result = []
+	for (dt, columns), recommendation in recommendations.items():
+		if dt not in existing:
+			existing[dt] = get_existing_indexes(dt)
+		if is_covered(list(columns), existing[dt]):
+			continue
+		result.append(recommendation)
+
+	return sorted(result, key=lambda r: (r["total_time"], r["count"]), reverse=True)
+
+
+@frappe.whitelist()
+def create_index(doctype: str, columns: list):
+	"""
+	Create a recommended composite index and report query plans before and after.
+
+	:param columns: index columns in order
+	:return: index name with `explain` output of a sample query before and after
+	"""
+	frappe.only_for("System Manager")
+
+	if doctype not in ADVISED_DOCTYPES:
+		frappe.throw(_("Indexes can only be created for {0}").format(", ".join(ADVISED_DOCTYPES)))
+
+	columns = frappe.parse_json(columns)
+	meta = frappe.get_meta(doctype)
+	for column in columns:
+		if column not in ("name", "owner", "creation", "modified", "modified_by") and not meta.get_field(
+			column
+		):
+			frappe.throw(_("{0} is not a field of {1}").format(column, doctype))
+
+	pattern = get_sample_pattern(doctype, columns)
+	index_name = get_index_name(columns)
+
+	before = explain(doctype, pattern)
+	frappe.db.add_index(doctype, columns, index_name)
+	after = explain(doctype, pattern)
+
+	return {"index_name": index_name, "before": before, "after": after}
+
+
+def get_sample_pattern(doctype, columns):
+	for pattern in get_query_patterns(doctype):
+		if get_index_columns(pattern["signature"]) == columns:
+			return pattern
+	return {"sample_filters": {}, "sample_order_by": None}
+
+
+def explain(doctype, pattern):
+	query = frappe.get_list(
+		doctype,
+		filters=pattern.get("sample_filters") or {},
+		order_by=pattern.get("sample_order_by"),
+		page_length=20,
+		run=0,
+	)
+	return frappe.db.sql(f"explain {query}", as_dict=True)
+
+
+def get_index_name(columns):
+	return ("crm_" + "_".join(columns))[:64]
@@ -0,0 +1,142 @@
+import frappe
+from frappe.utils import cint
+
+from crm.api.count import get_group_counts, get_total_count
+from crm.api.pagination import encode_cursor, get_keyset_page, parse_order_by
+
+
+def get_kanban_data(
+	doctype,
+	rows,
+	filters,
+	order_by,
+	column_field,
+	kanban_columns,
+	kanban_fields,
+	cursor=None,
+	estimated=False,
+):
+	"""
+	Get records of every kanban column.
+
+	First pages of all columns are fetched with one windowed query and their
+	counts with one grouped query. Columns paged with a cursor are fetched
+	on their own.
+
+	:param filters: base filters of the view as a list of filters
+	:param kanban_columns: columns with optional `order`, `page_length`, `cursor` and `delete`
+	"""
+
+	def in_window(kc):
+		return column_field and kc.get("name") and not kc.get("delete") and not kc.get("cursor")
+
+	windowed = [kc for kc in kanban_columns if in_window(kc)]
+	records = get_first_pages(doctype, rows, filters, order_by, column_field, windowed)
+	counts = get_group_counts(doctype, filters, column_field) if windowed else {}
+
+	data = []
+	for kc in kanban_columns:
+		order = kc.get("order")
+		column_data = []
+
+		if not kc.get("delete"):
+			column_filters = list(filters)
+			if column_field and kc.get("name"):
+				column_filters.append([doctype, column_field, "=", kc.get("name")])
+
+			if in_window(kc):
+				column_data = records.get(kc.get("name"), [])
+				kc["all_count"], kc["all_count_estimated"] = counts.get(kc.get("name"), 0), False
+				if cursor is not None:
+					kc["next_cursor"] = get_next_cursor(doctype, order_by, column_data, kc)
+			else:
+				page_length = cint(kc.get("page_length", 20))
+				kc["all_count"], kc["all_count_estimated"] = get_total_count(
+					doctype, column_filters, estimated
+				)
+				page_filters = column_filters
+				if order and kc.get("cursor"):
+					# manually ordered records are part of the first page
+					page_filters = [*column_filters, [doctype, "name", "not in", order[:page_length]]]
+				column_data, kc["next_cursor"] = get_keyset_page(
+					doctype, rows, page_filters, order_by, page_length, kc.get("cursor")
+				)
+
+			kc["count"] = len(column_data)
+
+		if order:
+			column_data = sorted(
+				column_data,
+				key=lambda x: order.index(x.get("name")) if x.get("name") in order else len(order),
+			)
+
+		data.append({"column": kc, "fields": kanban_fields, "data": column_data})
+
+	return data
+
+
+def get_first_pages(doctype, rows, filters, order_by, column_field, columns):
+	"""
+	Fetch the first page of each column with a single query.
+
+	Records are ranked per `column_field` value with `ROW_NUMBER()` and the
+	rank is cut off at each column's own `page_length`. Manually ordered
+	records rank before the rest of the column.
+
+	:return: records grouped by column value
+	"""
+	if not columns:
+		return {}
+
+	order_columns = parse_order_by(doctype, order_by)
+	fields = []
+	for fieldname in [*rows, column_field, *[f for f, _direction in order_columns]]:
+		if fieldname not in fields:
+			fields.append(fieldname)
+
+	column_names = [kc.get("name") for kc in columns]
+	subquery = frappe.get_list(
+		doctype,
+		fields=fields,
+		filters=[*filters, [doctype, column_field, "in", column_names]],
+		order_by=None,
+		run=0,
+	)
+
+	rank_order = ", ".join(f"t.`{fieldname}` {direction}" for fieldname, direction in order_columns)
+	pinned = [name for kc in columns for name in (kc.get("order") or [])[: cint(kc.get("page_length", 20))]]
+	if pinned:
+		names = ", ".join(frappe.db.escape(name) for name in pinned)
+		rank_order = f"case when t.`name` in ({names}) then 0 else 1 end, {rank_order}"
+
+	page_lengths = " ".join(
+		f"when {frappe.db.escape(kc.get('name'))} then {cint(kc.get('page_length', 20))}" for kc in columns
+	)
+
+	query = f"""
+		select * from (
+			select t.*, row_number() over (
+				partition by t.`{column_field}` order by {rank_order}
+			) as _kanban_rank
+			from ({subquery}) t
+		) ranked
+		where _kanban_rank <= case `{column_field}` {page_lengths} else 20 end
+		order by _kanban_rank
+	"""
+
+	records = {}
+	for record in frappe.db.sql(query, as_dict=True):
+		record.pop("_kanban_rank", None)
+		records.setdefault(record.get(column_field), []).append(record)
+
+	return records
+
+
+def get_next_cursor(doctype, order_by, column_data, kc):
+	"""Cursor after the last record of a first page, manually ordered records are skipped"""
+	page_length = cint(kc.get("page_length", 20))
+	pinned = (kc.get("order") or [])[:page_length]
+	unpinned = [d for d in column_data if d.get("name") not in pinned]
+	if len(column_data) < page_length or not unpinned:
+		return None
+	return encode_cursor(unpinned[-1], parse_order_by(doctype, order_by))
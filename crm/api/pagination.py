@@ -0,0 +1,145 @@
+import base64
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cint, make_filter_tuple
+
+
+def parse_order_by(doctype, order_by):
+	"""
+	Split `order_by` into `(fieldname, direction)` pairs.
+
+	`name` is always appended as the final tie-breaker so that the resulting
+	sort order is total and can be resumed from a cursor.
+	"""
+	columns = []
+	for part in (order_by or "").split(","):
+		tokens = part.strip().split()
+		if not tokens:
+			continue
+		fieldname = tokens[0].split(".")[-1].strip("`")
+		direction = tokens[1].lower() if len(tokens) > 1 else "asc"
+		if direction not in ("asc", "desc"):
+			frappe.throw(_("Invalid sort order: {0}").format(part))
+		columns.append((fieldname, direction))
+
+	if not columns:
+		meta = frappe.get_meta(doctype)
+		columns.append((meta.sort_field or "modified", (meta.sort_order or "desc").lower()))
+
+	if "name" not in [fieldname for fieldname, _direction in columns]:
+		columns.append(("name", columns[-1][1]))
+
+	return columns
+
+
+def build_order_by(doctype, columns):
+	return ", ".join(f"`tab{doctype}`.`{fieldname}` {direction}" for fieldname, direction in columns)
+
+
+def encode_cursor(row, columns):
+	"""Build an opaque cursor pointing right after `row`"""
+	values = [row.get(fieldname) for fieldname, _direction in columns]
+	payload = json.dumps(values, default=str, separators=(",", ":"))
+	return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor, columns):
+	try:
+		values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+	except Exception:
+		frappe.throw(_("Invalid cursor"))
+
+	if not isinstance(values, list) or len(values) != len(columns):
+		frappe.throw(_("Cursor does not match the current sort order"))
+
+	return values
+
+
+def get_keyset_segments(doctype, columns, values):
+	"""
+	Return filter lists which, queried in order, yield the rows after `values`.
+
+	A keyset condition like `(a, name) < (x, y)` needs an OR which cannot be
+	expressed through `frappe.get_list` filters, so it is expanded into
+	disjoint segments instead: `a = x and name < y`, then `a < x`. Each
+	segment is a plain AND of index friendly comparisons.
+
+	frappe's `is set` and `is not set` filters treat null, 0 and "" alike, so
+	these are handled as a single unset value, sorting before any other.
+	"""
+	segments = []
+	for i in range(len(columns) - 1, -1, -1):
+		segment = []
+		for (fieldname, _direction), value in zip(columns[:i], values[:i], strict=True):
+			if is_unset(value):
+				segment.append([doctype, fieldname, "is", "not set"])
+			else:
+				segment.append([doctype, fieldname, "=", value])
+
+		fieldname, direction = columns[i]
+		value = values[i]
+		if is_unset(value):
+			# unset values sort first in ascending order, so everything set comes after
+			if direction == "desc":
+				continue
+			segments.append([*segment, [doctype, fieldname, "is", "set"]])
+		elif direction == "asc" or fieldname == "name":
+			segments.append([*segment, [doctype, fieldname, ">" if direction == "asc" else "<", value]])
+		else:
+			# and last in descending order, after every smaller value
+			segments.append([*segment, [doctype, fieldname, "is", "set"], [doctype, fieldname, "<", value]])
+			segments.append([*segment, [doctype, fieldname, "is", "not set"]])
+
+	return segments
+
+
+def is_unset(value):
+	"""Whether `value` is matched by an `is not set` filter"""
+	return value is None or value == "" or (isinstance(value, int | float) and value == 0)
+
+
+def get_keyset_page(doctype, fields, filters, order_by, page_length=20, cursor=None):
+	"""
+	Fetch a single page of `doctype` records starting after `cursor`.
+
+	:param fields: fields to fetch, sort columns are added if missing
+	:param filters: filters as dict or list of filters
+	:param order_by: sort order of the view
+	:param page_length: number of records to return
+	:param cursor: cursor returned with the previous page, empty for the first page
+	:return: records and the cursor for the next page (`None` on the last page)
+	"""
+	page_length = cint(page_length) or 20
+	columns = parse_order_by(doctype, order_by)
+	order_by = build_order_by(doctype, columns)
+
+	fields = list(fields or ["name"])
+	for fieldname, _direction in columns:
+		if fieldname not in fields:
+			fields.append(fieldname)
+
+	if isinstance(filters, dict):
+		filters = [make_filter_tuple(doctype, key, value) for key, value in filters.items()]
+	filters = list(filters or [])
+
+	if cursor:
+		segments = get_keyset_segments(doctype, columns, decode_cursor(cursor, columns))
+	else:
+		segments = [[]]
+
+	data = []
+	for segment in segments:
+		data += frappe.get_list(
+			doctype,
+			fields=fields,
+			filters=filters + segment,
+			order_by=order_by,
+			page_length=page_length - len(data),
+		)
+		if len(data) >= page_length:
+			break
+
+	next_cursor = encode_cursor(data[-1], columns) if len(data) >= page_length else None
+	return data, next_cursor
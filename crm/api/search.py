@@ -0,0 +1,166 @@
+import frappe
+from frappe.search.full_text_search import FullTextSearch, FuzzyTermExtended
+from frappe.utils import strip_html_tags
+from whoosh.fields import ID, TEXT, Schema
+from whoosh.qparser import FieldsPlugin, MultifieldParser, WildcardPlugin
+from whoosh.query import Or, Prefix, Term
+from whoosh.writing import AsyncWriter
+
+SEARCH_INDEX = "crm_search"
+
+# doctype: (title field, other searchable fields)
+SEARCH_DOCTYPES = {
+	"CRM Lead": ("lead_name", ["organization", "email", "mobile_no", "phone", "website", "job_title"]),
+	"CRM Deal": ("organization", ["lead_name", "email", "mobile_no", "phone", "website", "next_step"]),
+	"Contact": ("full_name", ["company_name", "email_id", "mobile_no", "phone"]),
+	"CRM Organization": ("organization_name", ["website", "industry", "territory"]),
+	"FCRM Note": ("title", ["content"]),
+	"CRM Task": ("title", ["description"]),
+}
+
+
+class CRMSearch(FullTextSearch):
+	"""Whoosh index over the main CRM doctypes, documents are keyed by `doctype/name`"""
+
+	def get_schema(self):
+		return Schema(
+			key=ID(stored=True, unique=True),
+			doctype=ID(stored=True),
+			name=ID(stored=True),
+			title=TEXT(stored=True, field_boost=2.0),
+			content=TEXT,
+		)
+
+	def get_id(self):
+		return "key"
+
+	def get_fields_to_search(self):
+		return ["title", "content"]
+
+	def update_index(self, document):
+		"""
+		Replace `document` in the index.
+
+		Unlike `FullTextSearch.update_index` the segments are not merged on
+		every save, `build_index` leaves a fully optimized index.
+		"""
+		if not document:
+			return
+		writer = AsyncWriter(self.get_index())
+		writer.delete_by_term(self.get_id(), document[self.get_id()])
+		writer.add_document(**document)
+		writer.commit()
+
+	def remove_document_from_index(self, doc_name):
+		if not doc_name:
+			return
+		writer = AsyncWriter(self.get_index())
+		writer.delete_by_term(self.get_id(), doc_name)
+		writer.commit()
+
+	def get_items_to_index(self):
+		documents = []
+		for doctype, (title_field, fields) in SEARCH_DOCTYPES.items():
+			for doc in frappe.get_all(doctype, fields=["name", title_field, *fields]):
+				documents.append(get_document(doctype, doc))
+		return documents
+
+	def search(self, text, doctype=None, limit=20):
+		"""
+		Search titles and content, ranked by BM25 with titles weighing more.
+
+		Words match with up to two typos and the last word also matches as a
+		prefix, so results show up while the user is still typing.
+		"""
+		ix = self.get_index()
+		with ix.searcher() as searcher:
+			parser = MultifieldParser(self.get_fields_to_search(), ix.schema, termclass=FuzzyTermExtended)
+			parser.remove_plugin_class(FieldsPlugin)
+			parser.remove_plugin_class(WildcardPlugin)
+			query = parser.parse(text)
+
+			words = text.lower().split()
+			if words:
+				query = Or([query, Prefix("title", words[-1]), Prefix("content", words[-1])])
+
+			results = searcher.search(
+				query, limit=limit, filter=Term("doctype", doctype) if doctype else None
+			)
+			return [self.parse_result(r) for r in results]
+
+	def parse_result(self, result):
+		return {"doctype": result["doctype"], "name": result["name"], "title": result["title"]}
+
+
+def get_document(doctype, doc):
+	title_field, fields = SEARCH_DOCTYPES[doctype]
+	content = [strip_html_tags(str(doc.get(f))) for f in fields if doc.get(f)]
+	return {
+		"key": f"{doctype}/{doc.name}",
+		"doctype": doctype,
+		"name": doc.name,
+		"title": doc.get(title_field) or doc.name,
+		"content": " ".join(content),
+	}
+
+
+@frappe.whitelist()
+def search(txt: str, doctype=None, limit=20):
+	"""
+	Search leads, deals, contacts, organizations, notes and tasks.
+
+	:param doctype: only search records of this doctype
+	:return: best matches first, filtered to records the user can read
+	"""
+	limit = int(limit)
+	if not txt or not txt.strip():
+		return []
+
+	# fetch extra matches to make up for those the user cannot read
+	results = CRMSearch(SEARCH_INDEX).search(txt, doctype, limit * 3)
+
+	names = {}
+	for result in results:
+		names.setdefault(result["doctype"], []).append(result["name"])
+
+	permitted = set()
+	for dt, dt_names in names.items():
+		for name in frappe.get_list(dt, filters={"name": ("in", dt_names)}, pluck="name"):
+			permitted.add((dt, name))
+
+	return [r for r in results if (r["doctype"], r["name"]) in permitted][:limit]
+
+
+def update_index(doctype, name, deleted=False):
+	index = CRMSearch(SEARCH_INDEX)
+	if deleted:
+		index.remove_document_from_index(f"{doctype}/{name}")
+		return
+
+	title_field, fields = SEARCH_DOCTYPES[doctype]
+	doc = frappe.db.get_value(doctype, name, ["name", title_field, *fields], as_dict=True)
+	if doc:
+		index.update_index(get_document(doctype, doc))
+
+
+def build_index():
+	"""Rebuild the search index from scratch"""
+	CRMSearch(SEARCH_INDEX).build()
+
+
+def on_change(doc, method=None):
+	if doc.doctype not in SEARCH_DOCTYPES:
+		return
+
+	title_field, fields = SEARCH_DOCTYPES[doc.doctype]
+	if method == "on_update" and not any(doc.has_value_changed(f) for f in [title_field, *fields]):
+		return
+
+	frappe.enqueue(
+		update_index,
+		queue="short",
+		enqueue_after_commit=True,
+		doctype=doc.doctype,
+		name=doc.name,
+		deleted=method == "on_trash",
+	)
@@ -0,0 +1,73 @@
+import hashlib
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+from crm.api.count import get_list_cache_version, get_permission_scope
+from crm.utils import clear_cache_version, get_cache_version
+
+DEFAULT_SNAPSHOT_TTL = 5 * 60
+
+
+def get_snapshot(doctype, view_name, args, compute):
+	"""
+	Return the result of `compute` for a view, shared between users through a snapshot.
+
+	Only views with `enable_snapshot` set are snapshotted. Snapshots are keyed by
+	the request `args` and the permission scope of the user, so a user is only
+	served records that a user with the same permissions has been served.
+
+	:param args: request arguments the result depends on
+	"""
+	ttl = get_snapshot_ttl(view_name)
+	if not ttl:
+		return compute()
+
+	if not frappe.has_permission(doctype, "read"):
+		frappe.throw(_("Not permitted to read {0}").format(doctype), frappe.PermissionError)
+
+	payload = json.dumps([args, get_permission_scope(doctype)], default=str, sort_keys=True)
+	digest = hashlib.md5(payload.encode()).hexdigest()
+	key = (
+		f"crm_view_snapshot:{doctype}:{get_snapshot_version(doctype)}:"
+		f"{get_list_cache_version(doctype)}:{view_name}:{digest}"
+	)
+
+	snapshot = frappe.cache().get_value(key)
+	if snapshot is None:
+		snapshot = compute()
+		frappe.cache().set_value(key, snapshot, expires_in_sec=ttl)
+	return snapshot
+
+
+def get_snapshot_ttl(view_name):
+	"""Snapshot ttl of a view, `None` if the view is not snapshotted or not visible to the user"""
+	if not view_name:
+		return None
+
+	view = frappe.db.get_value(
+		"CRM View Settings",
+		view_name,
+		["enable_snapshot", "snapshot_ttl", "public", "user"],
+		as_dict=True,
+	)
+	if not view or not view.enable_snapshot:
+		return None
+	if not view.public and view.user != frappe.session.user:
+		return None
+	return cint(view.snapshot_ttl) or DEFAULT_SNAPSHOT_TTL
+
+
+def get_snapshot_version(doctype):
+	return get_cache_version("crm_view_snapshot_version", doctype)
+
+
+def clear_snapshots(doctype):
+	"""Invalidate snapshots of all views of `doctype`"""
+	clear_cache_version("crm_view_snapshot_version", doctype)
+
+
+def on_change(doc, method=None):
+	clear_snapshots(doc.doctype)
@@ -0,0 +1,199 @@
+# Copyright (c) 2025, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from crm.api.activities import (
+	ACTIVITY_FEED_READY,
+	AVOID_FIELDS,
+	ActivityTimeline,
+	get_activities,
+	get_activity_key,
+	get_activity_page,
+	get_attachments,
+	get_deal_activities,
+	get_lead_activities,
+)
+
+# queries to build a deal timeline, whatever the length of its history
+MAX_TIMELINE_QUERIES = 20
+
+
+class TestActivityTimeline(IntegrationTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.lead = frappe.get_doc({"doctype": "CRM Lead", "first_name": "Timeline"}).insert()
+		self.deal = frappe.get_doc({"doctype": "CRM Deal", "lead": self.lead.name}).insert()
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def add_history(self, count):
+		for i in range(count):
+			for doc in (self.lead, self.deal):
+				frappe.get_doc(
+					{
+						"doctype": "Comment",
+						"comment_type": "Comment",
+						"reference_doctype": doc.doctype,
+						"reference_name": doc.name,
+						"content": f"Comment {i}",
+					}
+				).insert(ignore_permissions=True)
+				frappe.get_doc(
+					{
+						"doctype": "FCRM Note",
+						"title": f"Note {i}",
+						"reference_doctype": doc.doctype,
+						"reference_docname": doc.name,
+					}
+				).insert()
+				frappe.get_doc(
+					{
+						"doctype": "CRM Task",
+						"title": f"Task {i}",
+						"reference_doctype": doc.doctype,
+						"reference_docname": doc.name,
+					}
+				).insert()
+
+			self.deal.reload()
+			self.deal.next_step = f"Step {i}"
+			self.deal.save()
+
+	def test_query_count_does_not_grow_with_history(self):
+		self.add_history(1)
+		# warm up meta and settings caches
+		get_deal_activities(self.deal.name)
+		with self.assertQueryCount(MAX_TIMELINE_QUERIES):
+			get_deal_activities(self.deal.name)
+
+		self.add_history(10)
+		with self.assertQueryCount(MAX_TIMELINE_QUERIES):
+			get_deal_activities(self.deal.name)
+
+	def test_deal_timeline_includes_lead_once(self):
+		self.add_history(2)
+		activities, _calls, notes, tasks, _attachments = get_deal_activities(self.deal.name)
+
+		comments = [a for a in activities if a["activity_type"] == "comment"]
+		self.assertEqual(len(comments), 4)
+		self.assertEqual(len([c for c in comments if c["is_lead"]]), 2)
+
+		self.assertEqual(len(notes), 4)
+		self.assertEqual(len({note.name for note in notes}), 4)
+		self.assertEqual(len({task.name for task in tasks}), 4)
+
+		creations = [a for a in activities if a["activity_type"] == "creation"]
+		self.assertEqual(
+			sorted(a["data"] for a in creations), ["converted the lead to this deal", "created this lead"]
+		)
+
+	def test_lead_timeline(self):
+		self.add_history(1)
+		activities, _calls, notes, tasks, _attachments = get_lead_activities(self.lead.name)
+
+		self.assertTrue(all(a["is_lead"] for a in activities))
+		self.assertEqual([note.title for note in notes], ["Note 0"])
+		self.assertEqual([task.title for task in tasks], ["Task 0"])
+
+	def test_activity_pages_cover_the_whole_timeline(self):
+		self.add_history(3)
+
+		def keys(activities):
+			return [get_activity_key(v) for a in activities for v in [a, *a.get("other_versions", [])]]
+
+		expected = keys(get_deal_activities(self.deal.name)[0])
+
+		seen = []
+		cursor = None
+		while True:
+			page = get_activity_page(self.deal.name, limit=2, cursor=cursor)
+			seen += keys(page["activities"])
+			cursor = page["next_cursor"]
+			if not cursor:
+				break
+
+		self.assertEqual(sorted(seen), sorted(expected))
+		self.assertEqual(len(seen), len(set(seen)))
+
+	def test_activity_feed_matches_live_timeline(self):
+		self.add_history(2)
+		timeline = ActivityTimeline("CRM Deal", self.deal.name)
+		live = timeline.build()
+		feed = timeline.build_from_feed()
+
+		self.assertEqual(
+			sorted(get_activity_key(a) for a in live[0]), sorted(get_activity_key(a) for a in feed[0])
+		)
+		for live_records, feed_records in zip(live[1:], feed[1:], strict=True):
+			self.assertEqual(sorted(r.name for r in live_records), sorted(r.name for r in feed_records))
+
+	def test_timeline_is_built_live_until_feed_is_ready(self):
+		self.add_history(2)
+		# defaults are cached outside the transaction rolled back in tearDown
+		self.addCleanup(frappe.defaults.clear_cache, "__default")
+
+		def keys():
+			return sorted(get_activity_key(a) for a in get_activities(self.deal.name)[0])
+
+		expected = sorted(
+			get_activity_key(a) for a in ActivityTimeline("CRM Deal", self.deal.name).build()[0]
+		)
+
+		# a backfill in progress has emptied the feed and stored the flag as "0"
+		frappe.db.delete("CRM Activity")
+		for state, value in (("not ready", None), ("in progress", 0)):
+			with self.subTest(state=state):
+				if value is None:
+					frappe.defaults.clear_default(ACTIVITY_FEED_READY, parent="__default")
+				else:
+					frappe.db.set_default(ACTIVITY_FEED_READY, value)
+				self.assertEqual(keys(), expected)
+
+		frappe.db.set_default(ACTIVITY_FEED_READY, 1)
+		self.assertLess(len(keys()), len(expected))
+
+	def test_attachments_are_grouped_by_record(self):
+		self.add_history(2)
+		comments = frappe.get_all(
+			"Comment", filters={"reference_name": self.deal.name, "comment_type": "Comment"}, pluck="name"
+		)
+		note = frappe.get_all("FCRM Note", filters={"reference_docname": self.deal.name}, pluck="name")[0]
+		for doctype, name in (("Comment", comments[0]), ("FCRM Note", note)):
+			frappe.get_doc(
+				{
+					"doctype": "File",
+					"file_name": f"{name}.txt",
+					"content": "attachment",
+					"attached_to_doctype": doctype,
+					"attached_to_name": name,
+				}
+			).insert(ignore_permissions=True)
+
+		activities, _calls, notes, _tasks, _attachments = get_deal_activities(self.deal.name)
+		attachments = {a["name"]: a["attachments"] for a in activities if a["activity_type"] == "comment"}
+		self.assertEqual([f.file_name for f in attachments[comments[0]]], [f"{comments[0]}.txt"])
+		self.assertEqual(attachments[comments[1]], [])
+
+		note_attachments = {n.name: n.attachments for n in notes}
+		self.assertEqual([f.file_name for f in note_attachments[note]], [f"{note}.txt"])
+		self.assertEqual(get_attachments("FCRM Note", [note])[note], note_attachments[note])
+
+	def test_version_keeps_every_changed_field(self):
+		self.deal.reload()
+		self.deal.next_step = "Send proposal"
+		self.deal.probability = 40
+		self.deal.save()
+
+		activities = ActivityTimeline("CRM Deal", self.deal.name).get_version_activities()
+		changed = {a["data"]["field"] for a in activities}
+		self.assertTrue({"next_step", "probability"} <= changed)
+		self.assertFalse(changed & set(AVOID_FIELDS["CRM Deal"]))
+
+		# cached changes are served without reading version data again
+		timeline = ActivityTimeline("CRM Deal", self.deal.name)
+		with self.assertQueryCount(1):
+			cached = timeline.get_version_activities()
+		self.assertEqual(cached, activities)
@@ -0,0 +1,78 @@
+# Copyright (c) 2025, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import datetime
+import json
+
+import frappe
+from frappe.tests import UnitTestCase
+
+from crm.api.encoding import decode_rows, encode_rows
+
+
+class TestEncoding(UnitTestCase):
+	def assertRoundTrip(self, rows):
+		expected = json.loads(frappe.as_json(rows))
+		encoded = json.loads(frappe.as_json(encode_rows(rows)))
+		self.assertEqual(decode_rows(encoded), expected)
+
+	def test_list_rows(self):
+		rows = [
+			{
+				"name": "CRM-LEAD-2025-00001",
+				"status": "New",
+				"annual_revenue": 1200.5,
+				"_assign": '["sales@example.com"]',
+				"_liked_by": None,
+				"modified": datetime.datetime(2025, 1, 2, 10, 20, 30, 123456),
+			},
+			{
+				"name": "CRM-LEAD-2025-00002",
+				"status": "Qualified",
+				"annual_revenue": 0,
+				"_assign": None,
+				"_liked_by": '["admin@example.com"]',
+				"modified": datetime.datetime(2025, 1, 3, 8, 0),
+			},
+		]
+		self.assertRoundTrip(rows)
+
+		payload = encode_rows(rows)
+		self.assertEqual(payload["columns"][0], "name")
+		self.assertEqual(payload["types"], {"modified": "datetime"})
+		self.assertEqual(len(payload["values"]), 2)
+
+	def test_mixed_rows(self):
+		# timeline entries do not share the same keys
+		rows = [
+			{
+				"activity_type": "creation",
+				"creation": datetime.datetime(2025, 1, 1),
+				"data": "created this lead",
+			},
+			{
+				"activity_type": "changed",
+				"creation": datetime.datetime(2025, 1, 2),
+				"data": {"field": "status", "old_value": "New", "value": "Qualified"},
+				"options": None,
+			},
+			{"name": "Comment-1", "activity_type": "comment", "attachments": []},
+		]
+		self.assertRoundTrip(rows)
+
+		payload = encode_rows(rows)
+		self.assertIn(payload["columns"].index("options"), payload["absent"]["0"])
+
+	def test_empty(self):
+		self.assertRoundTrip([])
+		self.assertEqual(encode_rows([])["values"], [])
+
+	def test_dates_and_durations(self):
+		rows = [
+			{
+				"due_date": datetime.date(2025, 2, 1),
+				"start_time": datetime.timedelta(hours=9, minutes=30),
+			}
+		]
+		self.assertRoundTrip(rows)
+		self.assertEqual(encode_rows(rows)["types"], {"due_date": "date", "start_time": "duration"})
@@ -0,0 +1,161 @@
+# Copyright (c) 2025, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+from functools import cmp_to_key
+
+from frappe.tests import UnitTestCase
+
+from crm.api.pagination import decode_cursor, encode_cursor, get_keyset_segments
+
+DOCTYPE = "CRM Lead"
+
+# status may be null, source is empty instead and annual_revenue is a NOT NULL
+# currency column defaulting to 0, like in the doctypes
+ROWS = [
+	{"name": "L01", "status": "New", "source": "Web", "annual_revenue": 100},
+	{"name": "L02", "status": "New", "source": "", "annual_revenue": 100},
+	{"name": "L03", "status": "New", "source": "Web", "annual_revenue": 0},
+	{"name": "L04", "status": "Qualified", "source": "Call", "annual_revenue": 100},
+	{"name": "L05", "status": None, "source": "", "annual_revenue": 50},
+	{"name": "L06", "status": "Qualified", "source": "", "annual_revenue": 0},
+	{"name": "L07", "status": "New", "source": "Web", "annual_revenue": 100},
+	{"name": "L08", "status": None, "source": "Call", "annual_revenue": 0},
+	{"name": "L09", "status": "Lost", "source": "", "annual_revenue": 300},
+	{"name": "L10", "status": "New", "source": "Web", "annual_revenue": 20},
+]
+
+# value `ifnull` falls back to in filters on each column
+FALLBACK = {"name": "", "status": "", "source": "", "annual_revenue": 0}
+
+
+def compare(a, b, direction):
+	"""Compare like MariaDB, nulls sort first in ascending order"""
+	if a == b:
+		return 0
+	if a is None:
+		result = -1
+	elif b is None:
+		result = 1
+	else:
+		result = -1 if a < b else 1
+	return result if direction == "asc" else -result
+
+
+def sort_rows(rows, columns):
+	def compare_rows(a, b):
+		for fieldname, direction in columns:
+			if result := compare(a[fieldname], b[fieldname], direction):
+				return result
+		return 0
+
+	return sorted(rows, key=cmp_to_key(compare_rows))
+
+
+def matches(row, segment):
+	"""Apply a segment the way frappe builds its conditions"""
+	for _doctype, fieldname, operator, value in segment:
+		field_value = row[fieldname]
+		fallback = field_value if field_value is not None else FALLBACK[fieldname]
+		if operator == "is":
+			# `ifnull(col, '') != ''`, where 0 equals '' on numeric columns
+			is_set = field_value not in (None, "", 0)
+			if is_set != (value == "set"):
+				return False
+		elif operator == "=":
+			# truthy values are compared as is, others through `ifnull`
+			if (field_value if value else fallback) != value:
+				return False
+		elif operator == ">" and not fallback > value:
+			return False
+		elif operator == "<" and not fallback < value:
+			return False
+	return True
+
+
+def get_page(rows, columns, page_length, cursor=None):
+	"""Page through `rows` the way `get_keyset_page` queries them"""
+	segments = get_keyset_segments(DOCTYPE, columns, decode_cursor(cursor, columns)) if cursor else [[]]
+	data = []
+	for segment in segments:
+		data += sort_rows([row for row in rows if matches(row, segment)], columns)[: page_length - len(data)]
+		if len(data) >= page_length:
+			break
+	next_cursor = encode_cursor(data[-1], columns) if len(data) >= page_length else None
+	return data, next_cursor
+
+
+class TestPagination(UnitTestCase):
+	def assertPagesMatch(self, columns, page_length):
+		pages, cursor = [], None
+		# a cursor that serves rows again would page forever
+		for _i in range(len(ROWS) + 1):
+			data, cursor = get_page(ROWS, columns, page_length, cursor)
+			pages += [row["name"] for row in data]
+			if not cursor:
+				break
+		self.assertEqual(pages, [row["name"] for row in sort_rows(ROWS, columns)])
+
+	def test_pages_follow_sort_order(self):
+		orders = [
+			[("annual_revenue", "desc"), ("name", "desc")],
+			[("annual_revenue", "asc"), ("name", "asc")],
+			[("source", "desc"), ("name", "asc")],
+			[("source", "asc"), ("annual_revenue", "desc"), ("name", "asc")],
+			[("status", "asc"), ("annual_revenue", "desc"), ("name", "asc")],
+			[("status", "desc"), ("source", "asc"), ("name", "desc")],
+		]
+		for columns in orders:
+			for page_length in (1, 2, 3, 4, 20):
+				with self.subTest(columns=columns, page_length=page_length):
+					self.assertPagesMatch(columns, page_length)
+
+	def test_page_across_tie(self):
+		# L01, L02, L04 and L07 share the same revenue, the page ends between them
+		columns = [("annual_revenue", "desc"), ("name", "asc")]
+		first, cursor = get_page(ROWS, columns, 3)
+		self.assertEqual([row["name"] for row in first], ["L09", "L01", "L02"])
+		second, _cursor = get_page(ROWS, columns, 3, cursor)
+		self.assertEqual([row["name"] for row in second], ["L04", "L07", "L05"])
+
+	def test_unset_cursor_values(self):
+		columns = [("status", "asc"), ("name", "asc")]
+		cursor = encode_cursor({"name": "L05", "status": None}, columns)
+		self.assertEqual(decode_cursor(cursor, columns), [None, "L05"])
+		self.assertEqual(
+			get_keyset_segments(DOCTYPE, columns, [None, "L05"]),
+			[
+				[[DOCTYPE, "status", "is", "not set"], [DOCTYPE, "name", ">", "L05"]],
+				[[DOCTYPE, "status", "is", "set"]],
+			],
+		)
+
+		# nothing sorts after an unset value in descending order, frappe filters
+		# cannot tell null, 0 and "" apart so they are one value
+		for fieldname, value in (("status", None), ("annual_revenue", 0), ("source", "")):
+			with self.subTest(fieldname=fieldname, value=value):
+				columns = [(fieldname, "desc"), ("name", "desc")]
+				self.assertEqual(
+					get_keyset_segments(DOCTYPE, columns, [value, "L03"]),
+					[[[DOCTYPE, fieldname, "is", "not set"], [DOCTYPE, "name", "<", "L03"]]],
+				)
+
+	def test_mixed_directions(self):
+		columns = [("status", "asc"), ("annual_revenue", "desc"), ("name", "asc")]
+		self.assertEqual(
+			get_keyset_segments(DOCTYPE, columns, ["New", 100, "L02"]),
+			[
+				[
+					[DOCTYPE, "status", "=", "New"],
+					[DOCTYPE, "annual_revenue", "=", 100],
+					[DOCTYPE, "name", ">", "L02"],
+				],
+				[
+					[DOCTYPE, "status", "=", "New"],
+					[DOCTYPE, "annual_revenue", "is", "set"],
+					[DOCTYPE, "annual_revenue", "<", 100],
+				],
+				# unset values come last in descending order
+				[[DOCTYPE, "status", "=", "New"], [DOCTYPE, "annual_revenue", "is", "not set"]],
+				[[DOCTYPE, "status", ">", "New"]],
+			],
+		)
@@ -1,9 +1,17 @@
 import frappe
 from frappe import _
+from crm.api.count import clear_list_cache
+from crm.fcrm.doctype.crm_assignment.crm_assignment import sync_assignment
 from crm.fcrm.doctype.crm_notification.crm_notification import notify_user
 
 
 def after_insert(doc, method):
+    sync_assignment(doc)
+
+    if doc.reference_type:
+        # assignments change `_assign` of the reference document
+        clear_list_cache(doc.reference_type)
+
     if (
         doc.reference_type in ["CRM Lead", "CRM Deal"]
         and doc.reference_name
@@ -27,6 +35,11 @@ def after_insert(doc, method):
 
 
 def on_update(doc, method):
+    sync_assignment(doc)
+
+    if doc.reference_type and doc.has_value_changed("status"):
+        clear_list_cache(doc.reference_type)
+
     if (
         doc.has_value_changed("status")
         and doc.status == "Cancelled"
@@ -37,6 +50,12 @@ def on_update(doc, method):
         notify_assigned_user(doc, is_cancelled=True)
 
 
+def on_trash(doc, method):
+    frappe.db.delete("CRM Assignment", {"todo": doc.name})
+    if doc.reference_type:
+        clear_list_cache(doc.reference_type)
+
+
 def notify_assigned_user(doc, is_cancelled=False):
     _doc = frappe.get_doc(doc.reference_type, doc.reference_name)
     owner = frappe.get_cached_value("User", frappe.session.user, "full_name")
@@ -0,0 +1,93 @@
+import hashlib
+import json
+
+import frappe
+from frappe import _
+from frappe.model import no_value_fields
+
+from crm.api.views import get_views
+from crm.fcrm.doctype.crm_form_script.crm_form_script import get_form_script
+from crm.utils import clear_cache_version, get_cache_version
+
+STANDARD_FIELDS = [
+	{"label": "Name", "fieldtype": "Data", "fieldname": "name"},
+	{"label": "Created On", "fieldtype": "Datetime", "fieldname": "creation"},
+	{"label": "Last Modified", "fieldtype": "Datetime", "fieldname": "modified"},
+	{
+		"label": "Modified By",
+		"fieldtype": "Link",
+		"fieldname": "modified_by",
+		"options": "User",
+	},
+	{"label": "Assigned To", "fieldtype": "Text", "fieldname": "_assign"},
+	{"label": "Owner", "fieldtype": "Link", "fieldname": "owner", "options": "User"},
+	{"label": "Like", "fieldtype": "Data", "fieldname": "_liked_by"},
+]
+
+
+def get_view_meta(doctype):
+	"""
+	Get fields, views and scripts used by list views of `doctype`.
+
+	The bundle is cached per user and language and carries a `version` hash
+	of its content, so clients can skip downloading it again.
+	"""
+	key = (
+		f"crm_view_meta:{doctype}:{get_view_meta_version(doctype)}:{frappe.session.user}:{frappe.local.lang}"
+	)
+	bundle = frappe.cache().get_value(key)
+	if bundle is None:
+		bundle = build_view_meta(doctype)
+		frappe.cache().set_value(key, bundle, expires_in_sec=24 * 60 * 60)
+	return bundle
+
+
+def build_view_meta(doctype):
+	fields = frappe.get_meta(doctype).fields
+	fields = [field for field in fields if field.fieldtype not in no_value_fields]
+	fields = [
+		{
+			"label": _(field.label),
+			"fieldtype": field.fieldtype,
+			"fieldname": field.fieldname,
+			"options": field.options,
+		}
+		for field in fields
+		if field.label and field.fieldname
+	]
+
+	for field in STANDARD_FIELDS:
+		if field not in fields:
+			fields.append({**field, "label": _(field["label"])})
+
+	bundle = {
+		"fields": fields,
+		"views": get_views(doctype),
+		"form_script": get_form_script(doctype),
+		"list_script": get_form_script(doctype, "List"),
+	}
+	content = json.dumps(bundle, default=str, sort_keys=True)
+	bundle["version"] = hashlib.md5(content.encode()).hexdigest()
+	return bundle
+
+
+def get_view_meta_version(doctype):
+	return get_cache_version("crm_view_meta_version", doctype)
+
+
+def clear_view_meta(doctype):
+	"""Invalidate cached view metadata of `doctype` for all users"""
+	if doctype:
+		clear_cache_version("crm_view_meta_version", doctype)
+
+
+def on_change(doc, method=None):
+	fieldname = {
+		"CRM View Settings": "dt",
+		"CRM Form Script": "dt",
+		"Custom Field": "dt",
+		"Property Setter": "doc_type",
+		"DocType": "name",
+	}.get(doc.doctype)
+	if fieldname:
+		clear_view_meta(doc.get(fieldname))
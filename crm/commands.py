@@ -0,0 +1,183 @@
+import random
+import statistics
+import time
+
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("crm-build-search-index")
+@pass_context
+def build_search_index(context):
+	"""Rebuild the CRM global search index"""
+	from crm.api.search import build_index
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		build_index()
+	finally:
+		frappe.destroy()
+
+
+@click.command("crm-backfill-activity-feed")
+@click.option("--batch-size", default=500, help="Sources to sync between commits")
+@pass_context
+def backfill_activity_feed(context, batch_size):
+	"""Rebuild the materialized lead and deal activity feed"""
+	from crm.api.activity_feed import backfill
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		backfill(batch_size)
+	finally:
+		frappe.destroy()
+
+
+@click.command("crm-rebuild-counters")
+@pass_context
+def rebuild_counters(context):
+	"""Recount emails, comments, tasks and notes of every lead and deal"""
+	from crm.fcrm.doctype.crm_counter.crm_counter import rebuild
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		rebuild()
+		frappe.db.commit()
+	finally:
+		frappe.destroy()
+
+
+@click.command("crm-recompute-sla")
+@click.argument("sla")
+@click.option("--dry-run", is_flag=True, help="Print the changes instead of writing them")
+@click.option("--include-responded", is_flag=True, help="Also recompute records with a first response")
+@click.option("--batch-size", default=1000, help="Records recomputed between commits")
+@pass_context
+def recompute_sla(context, sla, dry_run, include_responded, batch_size):
+	"""Recompute response targets and SLA status of the open records of an SLA"""
+	from crm.fcrm.doctype.crm_service_level_agreement import recompute
+
+	def on_progress(count, total, changed):
+		click.echo(f"{count}/{total} records, {changed} changed")
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		result = recompute.recompute_sla(
+			sla,
+			dry_run=dry_run,
+			include_responded=include_responded,
+			batch_size=batch_size,
+			on_progress=on_progress,
+		)
+		for row in result.get("diff", []):
+			click.echo(f"{row['name']} {row['field']}: {row['old']} -> {row['new']}")
+	finally:
+		frappe.destroy()
+
+
+@click.command("crm-search-benchmark")
+@click.option("--queries", default=200, help="Number of searches to run")
+@pass_context
+def search_benchmark(context, queries):
+	"""Compare global search latency against LIKE queries on the same terms"""
+	from crm.api.search import SEARCH_DOCTYPES, SEARCH_INDEX, CRMSearch
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		titles = []
+		for doctype, (title_field, _fields) in SEARCH_DOCTYPES.items():
+			titles += frappe.get_all(doctype, pluck=title_field, limit=queries)
+		words = [w for title in titles if title for w in title.split() if len(w) > 3]
+		if not words:
+			click.echo("Nothing to search, add some records first")
+			return
+
+		random.seed(0)
+		terms = [get_search_term(random.choice(words)) for _i in range(queries)]
+		index = CRMSearch(SEARCH_INDEX)
+
+		def run_index(term):
+			index.search(term, limit=20)
+
+		def run_like(term):
+			for doctype, (title_field, _fields) in SEARCH_DOCTYPES.items():
+				frappe.get_all(doctype, filters={title_field: ("like", f"%{term}%")}, limit=20)
+
+		for label, run in (("index", run_index), ("like", run_like)):
+			timings = []
+			for term in terms:
+				started = time.perf_counter()
+				run(term)
+				timings.append((time.perf_counter() - started) * 1000)
+			timings.sort()
+			click.echo(
+				f"{label}: p50 {statistics.median(timings):.1f}ms, "
+				f"p95 {timings[int(len(timings) * 0.95) - 1]:.1f}ms, max {timings[-1]:.1f}ms"
+			)
+	finally:
+		frappe.destroy()
+
+
+@click.command("crm-html-benchmark")
+@click.option("--runs", default=10000, help="Number of times each snippet is parsed")
+def html_benchmark(runs):
+	"""Compare timeline HTML extraction against BeautifulSoup on typical snippets"""
+	from bs4 import BeautifulSoup
+
+	from crm.utils.html_extract import get_first_link, get_mentions
+
+	attachment_log = '<a href="/private/files/proposal-v2.pdf" target="_blank">proposal-v2.pdf</a>'
+	comment = (
+		"<p>Can you review this before the call? "
+		'<span class="mention" data-type="mention" data-id="jane@example.com" data-label="Jane">@Jane</span> '
+		'<span class="mention" data-type="mention" data-id="raj@example.com" data-label="Raj">@Raj</span></p>'
+	)
+
+	cases = [
+		(
+			"attachment log",
+			lambda: BeautifulSoup(attachment_log, "html.parser").find("a"),
+			lambda: get_first_link(attachment_log),
+		),
+		(
+			"mentions",
+			lambda: BeautifulSoup(comment, "html.parser").find_all("span", attrs={"data-type": "mention"}),
+			lambda: get_mentions(comment),
+		),
+	]
+	for label, soup, extract in cases:
+		timings = {}
+		for name, run in (("beautifulsoup", soup), ("html_extract", extract)):
+			started = time.perf_counter()
+			for _i in range(runs):
+				run()
+			timings[name] = (time.perf_counter() - started) * 1_000_000 / runs
+		click.echo(
+			f"{label}: beautifulsoup {timings['beautifulsoup']:.1f}us, "
+			f"html_extract {timings['html_extract']:.1f}us, "
+			f"{timings['beautifulsoup'] / timings['html_extract']:.1f}x faster"
+		)
+
+
+def get_search_term(word):
+	"""A prefix or a one letter typo of `word`, the way users type"""
+	if random.random() < 0.5:
+		return word[: random.randint(3, len(word))]
+	i = random.randrange(len(word))
+	return word[:i] + random.choice("abcdefghijklmnopqrstuvwxyz") + word[i + 1 :]
+
+
+commands = [
+	build_search_index,
+	backfill_activity_feed,
+	rebuild_counters,
+	recompute_sla,
+	search_benchmark,
+	html_benchmark,
+]
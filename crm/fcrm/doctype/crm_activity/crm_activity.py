@@ -0,0 +1,14 @@
+# Copyright (c) 2025, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class CRMActivity(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("CRM Activity", ["reference_name", "activity_date"])
+	frappe.db.add_index("CRM Activity", ["source_name", "source_doctype"])
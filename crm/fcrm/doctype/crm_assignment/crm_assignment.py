@@ -0,0 +1,145 @@
+# Copyright (c) 2025, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, now_datetime
+
+CLOSED_STATUSES = ("Cancelled", "Closed")
+
+# beyond this many records a `name in (...)` filter is no cheaper than scanning `_assign`
+MAX_ASSIGNED_NAMES = 5000
+
+# set once `backfill` has filled the table, `_assign` is searched directly until then
+ASSIGNMENT_INDEX_READY = "crm_assignment_index_ready"
+
+
+class CRMAssignment(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("CRM Assignment", ["user", "reference_doctype", "reference_name"])
+
+
+def sync_assignment(todo):
+	"""Add, update or remove the assignment row of `todo` to match its status"""
+	is_open = (
+		todo.status not in CLOSED_STATUSES
+		and todo.allocated_to
+		and todo.reference_type
+		and todo.reference_name
+	)
+	if not is_open:
+		frappe.db.delete("CRM Assignment", {"todo": todo.name})
+		return
+
+	values = {
+		"reference_doctype": todo.reference_type,
+		"reference_name": todo.reference_name,
+		"user": todo.allocated_to,
+	}
+	if frappe.db.exists("CRM Assignment", todo.name):
+		frappe.db.set_value("CRM Assignment", todo.name, values)
+	else:
+		frappe.get_doc({"doctype": "CRM Assignment", "todo": todo.name, **values}).insert(
+			ignore_permissions=True
+		)
+
+
+def get_assigned_names(doctype, user, limit=None):
+	"""Names of `doctype` records with an open assignment to `user`"""
+	return frappe.get_all(
+		"CRM Assignment",
+		filters={"reference_doctype": doctype, "user": user},
+		pluck="reference_name",
+		distinct=True,
+		limit=limit,
+	)
+
+
+def is_index_ready():
+	return bool(cint(frappe.db.get_default(ASSIGNMENT_INDEX_READY)))
+
+
+def get_assignment_filter(doctype, user, negate=False):
+	"""
+	Filter on `name` selecting records of `doctype` assigned to `user`.
+
+	:param negate: select records not assigned to `user` instead
+	:return: filter list or `None` when the index is not filled yet or the user
+	        has too many assignments to list
+	"""
+	if not is_index_ready():
+		return None
+
+	names = get_assigned_names(doctype, user, limit=MAX_ASSIGNED_NAMES + 1)
+	if len(names) > MAX_ASSIGNED_NAMES:
+		return None
+	return [doctype, "name", "not in" if negate else "in", names]
+
+
+def backfill(batch_size=5000):
+	"""
+	Rebuild assignment rows from open ToDos.
+
+	Rows are rewritten in place, so a filled table stays usable while this
+	runs. Rows not rewritten or synced since it started belong to ToDos that
+	are no longer open and are removed at the end.
+	"""
+	started = now_datetime()
+	last_name = ""
+	while True:
+		todos = frappe.get_all(
+			"ToDo",
+			filters={
+				"name": (">", last_name),
+				"status": ("not in", CLOSED_STATUSES),
+				"allocated_to": ("is", "set"),
+				"reference_type": ("is", "set"),
+				"reference_name": ("is", "set"),
+			},
+			fields=["name", "reference_type", "reference_name", "allocated_to"],
+			order_by="name asc",
+			limit=batch_size,
+		)
+		if not todos:
+			break
+
+		now = now_datetime()
+		frappe.db.delete("CRM Assignment", {"name": ("in", [todo.name for todo in todos])})
+		frappe.db.bulk_insert(
+			"CRM Assignment",
+			fields=[
+				"name",
+				"creation",
+				"modified",
+				"owner",
+				"modified_by",
+				"reference_doctype",
+				"reference_name",
+				"user",
+				"todo",
+			],
+			values=[
+				(
+					todo.name,
+					now,
+					now,
+					"Administrator",
+					"Administrator",
+					todo.reference_type,
+					todo.reference_name,
+					todo.allocated_to,
+					todo.name,
+				)
+				for todo in todos
+			],
+			ignore_duplicates=True,
+		)
+		frappe.db.commit()
+		last_name = todos[-1].name
+
+	frappe.db.delete("CRM Assignment", {"modified": ("<", started)})
+	frappe.db.set_default(ASSIGNMENT_INDEX_READY, 1)
+	frappe.db.commit()
@@ -4,7 +4,7 @@
 import frappe
 from frappe.model.document import Document
 
-from crm.integrations.api import get_contact_by_phone_number
+from crm.integrations.api import get_contacts_by_phone_numbers
 from crm.utils import seconds_to_duration
 
 
@@ -81,7 +81,7 @@ class CRMCallLog(Document):
 		return {"columns": columns, "rows": rows}
 
 	def parse_list_data(calls):
-		return [parse_call_log(call) for call in calls] if calls else []
+		return parse_call_logs(calls) if calls else []
 
 	def has_link(self, doctype, name):
 		for link in self.links:
@@ -96,42 +96,52 @@ class CRMCallLog(Document):
 
 
 def parse_call_log(call):
-	call["show_recording"] = False
-	call["_duration"] = seconds_to_duration(call.get("duration"))
-	if call.get("type") == "Incoming":
-		call["activity_type"] = "incoming_call"
-		contact = get_contact_by_phone_number(call.get("from"))
-		receiver = (
-			frappe.db.get_values("User", call.get("receiver"), ["full_name", "user_image"])[0]
-			if call.get("receiver")
-			else [None, None]
-		)
-		call["_caller"] = {
-			"label": contact.get("full_name", "Unknown"),
-			"image": contact.get("image"),
-		}
-		call["_receiver"] = {
-			"label": receiver[0],
-			"image": receiver[1],
-		}
-	elif call.get("type") == "Outgoing":
-		call["activity_type"] = "outgoing_call"
-		contact = get_contact_by_phone_number(call.get("to"))
-		caller = (
-			frappe.db.get_values("User", call.get("caller"), ["full_name", "user_image"])[0]
-			if call.get("caller")
-			else [None, None]
-		)
-		call["_caller"] = {
-			"label": caller[0],
-			"image": caller[1],
-		}
-		call["_receiver"] = {
-			"label": contact.get("full_name", "Unknown"),
-			"image": contact.get("image"),
-		}
-
-	return call
+	return parse_call_logs([call])[0]
+
+
+def parse_call_logs(calls):
+	"""Add caller and receiver details to call logs, looked up for all of them at once"""
+	numbers = []
+	for call in calls:
+		if call.get("type") == "Incoming":
+			numbers.append(call.get("from"))
+		elif call.get("type") == "Outgoing":
+			numbers.append(call.get("to"))
+	contacts = get_contacts_by_phone_numbers(numbers) if numbers else {}
+
+	users = {}
+	user_names = {call.get(f) for call in calls for f in ("caller", "receiver") if call.get(f)}
+	if user_names:
+		for user in frappe.get_all(
+			"User", filters={"name": ("in", list(user_names))}, fields=["name", "full_name", "user_image"]
+		):
+			users[user.name] = user
+
+	def get_user(name):
+		user = users.get(name) or {}
+		return {"label": user.get("full_name"), "image": user.get("user_image")}
+
+	for call in calls:
+		call["show_recording"] = False
+		call["_duration"] = seconds_to_duration(call.get("duration"))
+		if call.get("type") == "Incoming":
+			call["activity_type"] = "incoming_call"
+			contact = contacts.get(call.get("from")) or {}
+			call["_caller"] = {
+				"label": contact.get("full_name", "Unknown"),
+				"image": contact.get("image"),
+			}
+			call["_receiver"] = get_user(call.get("receiver"))
+		elif call.get("type") == "Outgoing":
+			call["activity_type"] = "outgoing_call"
+			contact = contacts.get(call.get("to")) or {}
+			call["_caller"] = get_user(call.get("caller"))
+			call["_receiver"] = {
+				"label": contact.get("full_name", "Unknown"),
+				"image": contact.get("image"),
+			}
+
+	return calls
 
 
 @frappe.whitelist()
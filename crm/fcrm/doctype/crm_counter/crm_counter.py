@@ -0,0 +1,154 @@
+# Copyright (c) 2025, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now_datetime
+
+COUNTED_DOCTYPES = ("CRM Lead", "CRM Deal")
+
+# counter field of each source, the field linking it to a lead or deal and
+# the types of records that are counted
+COUNTED_SOURCES = {
+	"Communication": {
+		"counter": "email_count",
+		"reference_name": "reference_name",
+		"type_field": "communication_type",
+		"types": ["Communication", "Automated Message"],
+	},
+	"Comment": {
+		"counter": "comment_count",
+		"reference_name": "reference_name",
+		"type_field": "comment_type",
+		"types": ["Comment"],
+	},
+	"CRM Task": {"counter": "task_count", "reference_name": "reference_docname"},
+	"FCRM Note": {"counter": "note_count", "reference_name": "reference_docname"},
+}
+
+COUNTER_FIELDS = [source["counter"] for source in COUNTED_SOURCES.values()]
+
+
+class CRMCounter(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_unique(
+		"CRM Counter", ["reference_doctype", "reference_name"], constraint_name="unique_reference"
+	)
+
+
+def on_change(doc, method=None):
+	"""Move the count of `doc` to the lead or deal it now belongs to"""
+	if doc.doctype not in COUNTED_SOURCES:
+		return
+
+	if method == "on_trash":
+		old, new = get_counted_reference(doc), None
+	else:
+		before = doc.get_doc_before_save()
+		old, new = get_counted_reference(before) if before else None, get_counted_reference(doc)
+
+	if old == new:
+		return
+
+	counter = COUNTED_SOURCES[doc.doctype]["counter"]
+	if old:
+		increment(*old, counter, -1)
+	if new:
+		increment(*new, counter, 1)
+
+
+def get_counted_reference(doc):
+	"""Lead or deal whose counter includes `doc`, if any"""
+	source = COUNTED_SOURCES[doc.doctype]
+	if source.get("type_field") and doc.get(source["type_field"]) not in source["types"]:
+		return None
+
+	reference = (doc.reference_doctype, doc.get(source["reference_name"]))
+	if reference[0] in COUNTED_DOCTYPES and reference[1]:
+		return reference
+	return None
+
+
+def increment(reference_doctype, reference_name, counter, delta):
+	"""Add `delta` to a counter in a single update, creating its row first if needed"""
+	now = now_datetime()
+	frappe.db.bulk_insert(
+		"CRM Counter",
+		["name", "reference_doctype", "reference_name", "creation", "modified"],
+		[[frappe.generate_hash(length=10), reference_doctype, reference_name, now, now]],
+		ignore_duplicates=True,
+	)
+
+	Counter = frappe.qb.DocType("CRM Counter")
+	(
+		frappe.qb.update(Counter)
+		.set(Counter[counter], Counter[counter] + delta)
+		.set(Counter.modified, now)
+		.where(Counter.reference_doctype == reference_doctype)
+		.where(Counter.reference_name == reference_name)
+	).run()
+
+
+def get_counts(doctype, names):
+	"""
+	Counts of `names` with a single query.
+
+	:return: `_email_count`, `_comment_count`, `_task_count` and `_note_count`
+	        keyed by name, zero for records without a counter
+	"""
+	counts = {name: {f"_{counter}": 0 for counter in COUNTER_FIELDS} for name in names}
+	if doctype not in COUNTED_DOCTYPES or not names:
+		return counts
+
+	counters = frappe.get_all(
+		"CRM Counter",
+		filters={"reference_doctype": doctype, "reference_name": ("in", list(names))},
+		fields=["reference_name", *COUNTER_FIELDS],
+	)
+	for row in counters:
+		counts[row.reference_name] = {f"_{counter}": row[counter] or 0 for counter in COUNTER_FIELDS}
+	return counts
+
+
+def set_counts(doctype, records):
+	"""Set counts on `records` of `doctype`, records are dicts with a `name`"""
+	counts = get_counts(doctype, [record.get("name") for record in records])
+	for record in records:
+		record.update(counts[record.get("name")])
+
+
+def rebuild():
+	"""Recount every counter from the sources"""
+	counters = {}
+	for doctype, source in COUNTED_SOURCES.items():
+		reference_name = source["reference_name"]
+		filters = {"reference_doctype": ("in", COUNTED_DOCTYPES), reference_name: ("is", "set")}
+		if source.get("type_field"):
+			filters[source["type_field"]] = ("in", source["types"])
+
+		rows = frappe.get_all(
+			doctype,
+			filters=filters,
+			fields=["reference_doctype", f"{reference_name} as reference_name", "count(*) as count"],
+			group_by=f"reference_doctype, {reference_name}",
+		)
+		for row in rows:
+			key = (row.reference_doctype, row.reference_name)
+			counters.setdefault(key, dict.fromkeys(COUNTER_FIELDS, 0))[source["counter"]] = row.count
+
+	now = now_datetime()
+	frappe.db.delete("CRM Counter")
+	if not counters:
+		return
+
+	frappe.db.bulk_insert(
+		"CRM Counter",
+		["name", "reference_doctype", "reference_name", "creation", "modified", *COUNTER_FIELDS],
+		[
+			[frappe.generate_hash(length=10), *key, now, now, *[values[f] for f in COUNTER_FIELDS]]
+			for key, values in counters.items()
+		],
+	)
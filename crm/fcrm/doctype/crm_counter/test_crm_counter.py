@@ -0,0 +1,53 @@
+# Copyright (c) 2025, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from crm.fcrm.doctype.crm_counter.crm_counter import get_counts, rebuild
+
+
+class TestCRMCounter(IntegrationTestCase):
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_counts_follow_hooks_and_rebuild(self):
+		frappe.set_user("Administrator")
+		leads = [
+			frappe.get_doc({"doctype": "CRM Lead", "first_name": f"Counter {i}"}).insert() for i in range(2)
+		]
+		lead = leads[0]
+
+		for title in ("First", "Second"):
+			frappe.get_doc(
+				{
+					"doctype": "FCRM Note",
+					"title": title,
+					"reference_doctype": "CRM Lead",
+					"reference_docname": lead.name,
+				}
+			).insert()
+		task = frappe.get_doc(
+			{
+				"doctype": "CRM Task",
+				"title": "Call",
+				"reference_doctype": "CRM Lead",
+				"reference_docname": lead.name,
+			}
+		).insert()
+		lead.add_comment("Comment", "Looks promising")
+
+		expected = {"_email_count": 0, "_comment_count": 1, "_task_count": 1, "_note_count": 2}
+		self.assertEqual(get_counts("CRM Lead", [lead.name])[lead.name], expected)
+
+		# moving a task moves its count
+		task.reference_docname = leads[1].name
+		task.save()
+		task.delete()
+		expected["_task_count"] = 0
+		counts = get_counts("CRM Lead", [leads[0].name, leads[1].name])
+		self.assertEqual(counts[lead.name], expected)
+		self.assertEqual(counts[leads[1].name]["_task_count"], 0)
+
+		rebuild()
+		self.assertEqual(get_counts("CRM Lead", [lead.name])[lead.name], expected)
@@ -7,6 +7,8 @@ from frappe.desk.form.assign_to import add as assign
 from frappe.model.document import Document
 from frappe.utils import has_gravatar, validate_email_address
 
+from crm.api.count import clear_list_cache
+from crm.api.snapshot import clear_snapshots
 from crm.fcrm.doctype.crm_service_level_agreement.utils import get_sla
 from crm.fcrm.doctype.crm_status_change_log.crm_status_change_log import (
 	add_status_change_log,
@@ -314,9 +316,9 @@ class CRMLead(Document):
 		"""
 		if not self.sla:
 			return
-		sla = frappe.get_last_doc("CRM Service Level Agreement", {"name": self.sla})
-		if sla:
-			sla.apply(self)
+		# cached until the SLA is saved
+		sla = frappe.get_cached_doc("CRM Service Level Agreement", self.sla)
+		sla.apply(self)
 
 	def convert_to_deal(self, deal=None):
 		return convert_to_deal(lead=self.name, doc=self, deal=deal)
@@ -400,6 +402,11 @@ class CRMLead(Document):
 		}
 
 
+def on_doctype_update():
+	# overdue first responses are looked up by the SLA breach job
+	frappe.db.add_index("CRM Lead", ["sla_status", "response_by"])
+
+
 @frappe.whitelist()
 def convert_to_deal(lead, doc=None, deal=None, existing_contact=None, existing_organization=None):
 	if not (doc and doc.flags.get("ignore_permissions")) and not frappe.has_permission(
@@ -413,6 +420,9 @@ def convert_to_deal(lead, doc=None, deal=None, existing_contact=None, existing_o
 	lead.db_set("converted", 1)
 	if lead.sla and frappe.db.exists("CRM Communication Status", "Replied"):
 		lead.db_set("communication_status", "Replied")
+	# db_set skips the hooks that invalidate cached lead counts and views
+	clear_list_cache("CRM Lead")
+	clear_snapshots("CRM Lead")
 	contact = lead.create_contact(existing_contact, False)
 	organization = lead.create_organization(existing_organization)
 	_deal = lead.create_deal(contact, organization, deal)
@@ -0,0 +1,77 @@
+import json
+
+import frappe
+from frappe.utils import now_datetime
+
+from crm.api.count import clear_list_cache
+from crm.api.snapshot import clear_snapshots
+
+SLA_DOCTYPES = ("CRM Lead", "CRM Deal")
+
+# records updated and committed together
+BREACH_BATCH_SIZE = 1000
+
+
+def mark_breached_slas():
+	"""
+	Mark leads and deals still waiting for a first response after `response_by` as failed.
+
+	`sla_status` is otherwise only updated when a record is saved. Overdue
+	records are found through the (sla_status, response_by) index and updated
+	in batches without loading documents, then every assigned user gets one
+	`crm_sla_breached` event listing their leads and deals by doctype.
+	"""
+	now = now_datetime()
+	# names of marked records keyed by assigned user, then by doctype
+	breached = {}
+	for doctype in SLA_DOCTYPES:
+		marked = False
+		while names := mark_breached_batch(doctype, now, breached):
+			marked = True
+			frappe.db.commit()
+			if len(names) < BREACH_BATCH_SIZE:
+				break
+
+		if marked:
+			clear_list_cache(doctype)
+			clear_snapshots(doctype)
+
+	for user, records in breached.items():
+		frappe.publish_realtime("crm_sla_breached", {"records": records}, user=user, after_commit=True)
+	frappe.db.commit()
+
+
+def mark_breached_batch(doctype, now, breached):
+	"""
+	Mark the next batch of overdue records of `doctype` as failed.
+
+	:param breached: names of marked records keyed by assigned user and doctype, updated in place
+	:return: names of the marked records
+	"""
+	Table = frappe.qb.DocType(doctype)
+	# records without a target never fail, like on save, and a plain range on
+	# `response_by` keeps the (sla_status, response_by) index usable
+	records = (
+		frappe.qb.from_(Table)
+		.select(Table.name, Table._assign)
+		.where(Table.sla_status == "First Response Due")
+		.where(Table.response_by.isnotnull() & (Table.response_by < now))
+		.orderby(Table.response_by)
+		.limit(BREACH_BATCH_SIZE)
+	).run(as_dict=True)
+	if not records:
+		return []
+
+	names = [record.name for record in records]
+	(
+		frappe.qb.update(Table)
+		.set(Table.sla_status, "Failed")
+		.set(Table.modified, now)
+		.where(Table.name.isin(names))
+		.where(Table.sla_status == "First Response Due")
+	).run()
+
+	for record in records:
+		for user in json.loads(record._assign or "[]"):
+			breached.setdefault(user, {}).setdefault(doctype, []).append(record.name)
+	return names
@@ -3,17 +3,10 @@
 
 import frappe
 from frappe import _
-from datetime import timedelta
 from frappe.model.document import Document
-from frappe.utils import (
-	add_to_date,
-	get_datetime,
-	get_weekdays,
-	getdate,
-	now_datetime,
-	time_diff_in_seconds,
-)
+from frappe.utils import get_datetime, getdate, now_datetime
 from crm.fcrm.doctype.crm_service_level_agreement.utils import get_context
+from crm.fcrm.doctype.crm_service_level_agreement.working_time import WorkingCalendar, get_calendar
 
 
 class CRMServiceLevelAgreement(Document):
@@ -104,7 +97,7 @@ class CRMServiceLevelAgreement(Document):
 
 	def is_first_response_failed(self, doc: Document):
 		if not doc.first_responded_on:
-			return get_datetime(doc.response_by) < now_datetime()
+			return get_datetime(doc.response_by) < self.get_calendar().now()
 		return get_datetime(doc.response_by) < get_datetime(doc.first_responded_on)
 
 	def calc_time(
@@ -112,34 +105,14 @@ class CRMServiceLevelAgreement(Document):
 		start_at: str,
 		duration_seconds: int,
 	):
-		res = get_datetime(start_at)
-		time_needed = duration_seconds
-		holidays = self.get_holidays()
-		weekdays = get_weekdays()
-		workdays = self.get_workdays()
-		while time_needed:
-			today = res
-			today_day = getdate(today)
-			today_weekday = weekdays[today.weekday()]
-			is_workday = today_weekday in workdays
-			is_holiday = today_day in holidays
-			if is_holiday or not is_workday:
-				res = add_to_date(res, days=1, as_datetime=True)
-				continue
-			today_workday = workdays[today_weekday]
-			now_in_seconds = time_diff_in_seconds(today, today_day)
-			start_time = max(today_workday.start_time.total_seconds(), now_in_seconds)
-			till_start_time = max(start_time - now_in_seconds, 0)
-			end_time = max(today_workday.end_time.total_seconds(), now_in_seconds)
-			time_left = max(end_time - start_time, 0)
-			if not time_left:
-				res = getdate(add_to_date(res, days=1, as_datetime=True))
-				continue
-			time_taken = min(time_needed, time_left)
-			time_needed -= time_taken
-			time_required = till_start_time + time_taken
-			res = add_to_date(res, seconds=time_required, as_datetime=True)
-		return res
+		"""
+		Get the moment `duration_seconds` of working time after `start_at`
+
+		:param start_at: Date at which calculation starts
+		:param duration_seconds: Working time needed
+		:return: Datetime, `None` when the SLA has no working hours
+		"""
+		return self.get_calendar().add_working_time(start_at, duration_seconds)
 
 	def calc_elapsed_time(self, start_time, end_time) -> float:
 		"""
@@ -149,25 +122,12 @@ class CRMServiceLevelAgreement(Document):
 		:param end_at: Date at which calculation ends
 		:return: Number of seconds
 		"""
-		start_time = get_datetime(start_time)
-		end_time = get_datetime(end_time)
-		holiday_list = []
-		working_day_list = self.get_working_days()
-		working_hours = self.get_working_hours()
-
-		total_seconds = 0
-		current_time = start_time
-
-		while current_time < end_time:
-			in_holiday_list = current_time.date() in holiday_list
-			not_in_working_day_list = get_weekdays()[current_time.weekday()] not in working_day_list
-			if in_holiday_list or not_in_working_day_list or not self.is_working_time(current_time, working_hours):
-				current_time += timedelta(seconds=1)
-				continue
-			total_seconds += 1
-			current_time += timedelta(seconds=1)
-
-		return total_seconds
+		return self.get_calendar().get_elapsed_time(start_time, end_time)
+
+	def get_calendar(self) -> WorkingCalendar:
+		if self.is_new():
+			return WorkingCalendar(self.get_working_hours(), self.get_holidays())
+		return get_calendar(self)
 
 	def get_priorities(self):
 		"""
@@ -188,38 +148,18 @@ class CRMServiceLevelAgreement(Document):
 
 		return self.priorities[0].priority
 
-	def get_workdays(self) -> dict[str, dict]:
-		"""
-		Return workdays related info as a dict. With `workday` as key
-		"""
-		res = {}
-		for row in self.working_hours:
-			res[row.workday] = row
-		return res
-
-	def get_working_days(self) -> dict[str, dict]:
-		workdays = []
-		for row in self.working_hours:
-			workdays.append(row.workday)
-		return workdays
-
 	def get_working_hours(self) -> dict[str, dict]:
 		res = {}
 		for row in self.working_hours:
 			res[row.workday] = (row.start_time, row.end_time)
 		return res
 
-	def is_working_time(self, date_time, working_hours):
-		day_of_week = get_weekdays()[date_time.weekday()]
-		start_time, end_time = working_hours.get(day_of_week, (0, 0))
-		date_time = timedelta(hours=date_time.hour, minutes=date_time.minute, seconds=date_time.second)
-		return start_time <= date_time < end_time
-
 	def get_holidays(self):
-		res = []
 		if not self.holiday_list:
-			return res
-		holiday_list = frappe.get_doc("CRM Holiday List", self.holiday_list)
-		for row in holiday_list.holidays:
-			res.append(row.date)
-		return res
+			return []
+		holidays = frappe.get_all(
+			"CRM Holiday",
+			filters={"parent": self.holiday_list, "parenttype": "CRM Holiday List"},
+			pluck="date",
+		)
+		return sorted(getdate(day) for day in holidays)
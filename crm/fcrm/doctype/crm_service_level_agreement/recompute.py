@@ -0,0 +1,188 @@
+import frappe
+from frappe import _
+from frappe.utils import get_datetime
+
+from crm.api.count import clear_list_cache
+from crm.api.snapshot import clear_snapshots
+
+# records read, recomputed and written together
+RECOMPUTE_BATCH_SIZE = 1000
+
+# changes sent back by a dry run
+MAX_DIFF_ROWS = 500
+
+RECOMPUTED_FIELDS = ["response_by", "first_response_time", "sla_status"]
+
+
+@frappe.whitelist()
+def enqueue_recompute(sla: str, dry_run=False, include_responded=False):
+	"""
+	Recompute SLA targets of records on `sla` in the background, progress is sent as realtime events.
+
+	:return: id of the job, which may already have been queued by an earlier request
+	"""
+	frappe.get_doc("CRM Service Level Agreement", sla).check_permission("write")
+	job_id = f"crm_sla_recompute:{sla}"
+	job = frappe.enqueue(
+		recompute_sla,
+		queue="long",
+		timeout=3600,
+		job_id=job_id,
+		deduplicate=True,
+		sla=sla,
+		dry_run=frappe.parse_json(dry_run),
+		include_responded=frappe.parse_json(include_responded),
+		user=frappe.session.user,
+	)
+	if not job:
+		frappe.msgprint(_("Targets of {0} are already being recomputed").format(sla), alert=True)
+	return job_id
+
+
+def recompute_sla(
+	sla,
+	dry_run=False,
+	include_responded=False,
+	batch_size=RECOMPUTE_BATCH_SIZE,
+	user=None,
+	on_progress=None,
+):
+	"""
+	Recompute `response_by`, `first_response_time` and `sla_status` of records on `sla`.
+
+	Records keep the targets of the rules they were created under, this applies
+	the current priorities, working hours and holidays to them. Records are read
+	in batches by name, targets of a batch are computed together and written
+	with one bulk update.
+
+	:param include_responded: also recompute records that got their first response
+	:param on_progress: called with `count`, `total` and `changed` after every batch
+	:return: number of records read and changed, and in a dry run the changes
+	        that would have been written
+	"""
+	sla = frappe.get_cached_doc("CRM Service Level Agreement", sla)
+	calendar = sla.get_calendar()
+	durations = {status: row.first_response_time or 0 for status, row in sla.get_priorities().items()}
+	now = calendar.now()
+
+	filters = {"sla": sla.name}
+	if not include_responded:
+		filters["first_responded_on"] = ("is", "not set")
+	total = frappe.db.count(sla.apply_on, filters)
+
+	count, changed, diff = 0, 0, []
+	last_name = None
+	while True:
+		batch_filters = {**filters, "name": (">", last_name)} if last_name else filters
+		records = frappe.get_all(
+			sla.apply_on,
+			filters=batch_filters,
+			fields=["name", "communication_status", "sla_creation", "first_responded_on", *RECOMPUTED_FIELDS],
+			order_by="name asc",
+			limit=batch_size,
+		)
+		if not records:
+			break
+
+		updates = get_updates(records, calendar, durations, now)
+		if dry_run:
+			diff += [
+				{"name": name, "field": field, "old": old, "new": new}
+				for name, changes in updates.items()
+				for field, (old, new) in changes.items()
+			]
+		elif updates:
+			frappe.db.bulk_update(
+				sla.apply_on,
+				{
+					name: {field: new for field, (_old, new) in changes.items()}
+					for name, changes in updates.items()
+				},
+			)
+			frappe.db.commit()
+
+		count += len(records)
+		changed += len(updates)
+		last_name = records[-1].name
+		publish_progress(sla.name, count, total, changed, dry_run, user)
+		if on_progress:
+			on_progress(count, total, changed)
+
+	if changed and not dry_run:
+		# counts and snapshots of views filtered on `sla_status` are cached
+		clear_list_cache(sla.apply_on)
+		clear_snapshots(sla.apply_on)
+
+	result = {"count": count, "changed": changed}
+	if dry_run:
+		result["diff"] = diff
+	publish_progress(sla.name, count, total, changed, dry_run, user, diff=diff[:MAX_DIFF_ROWS])
+	return result
+
+
+def get_updates(records, calendar, durations, now):
+	"""
+	Compute new targets of `records` the way `CRMServiceLevelAgreement.apply` does.
+
+	:return: changed fields of each changed record as `(old, new)` pairs, keyed by name
+	"""
+	records = [r for r in records if r.sla_creation]
+	timed = [r for r in records if r.communication_status in durations]
+	targets = calendar.add_working_time_many(
+		[r.sla_creation for r in timed], [durations[r.communication_status] for r in timed]
+	)
+	response_by = {r.name: target for r, target in zip(timed, targets, strict=True)}
+
+	updates = {}
+	for record in records:
+		# records without a priority of the SLA keep their target, like on save
+		new = {"response_by": response_by.get(record.name) or record.response_by}
+		if record.first_responded_on:
+			new["first_response_time"] = calendar.get_elapsed_time(
+				record.sla_creation, record.first_responded_on
+			)
+		new["sla_status"] = get_sla_status(new["response_by"], record.first_responded_on, now)
+
+		changes = {
+			field: (record[field], value) for field, value in new.items() if not is_same(record[field], value)
+		}
+		if changes:
+			updates[record.name] = changes
+	return updates
+
+
+def get_sla_status(response_by, first_responded_on, now):
+	"""Status `CRMServiceLevelAgreement.handle_sla_status` would set"""
+	responded_at = get_datetime(first_responded_on) if first_responded_on else now
+	if response_by and get_datetime(response_by) < responded_at:
+		return "Failed"
+	return "Fulfilled" if first_responded_on else "First Response Due"
+
+
+def is_same(old, new):
+	"""Compare a stored value with a computed one, ignoring the types the database returns"""
+	if old is None or new is None:
+		return old is None and new is None
+	if isinstance(new, str):
+		return old == new
+	if isinstance(new, int | float):
+		return float(old) == float(new)
+	return get_datetime(old) == get_datetime(new)
+
+
+def publish_progress(sla, count, total, changed, dry_run, user=None, diff=None):
+	if not user:
+		return
+	frappe.publish_realtime(
+		"crm_sla_recompute_progress",
+		{
+			"sla": sla,
+			"count": count,
+			"total": total,
+			"changed": changed,
+			"dry_run": dry_run,
+			"diff": diff,
+			"message": _("Recomputed {0} of {1} records").format(count, total),
+		},
+		user=user,
+	)
@@ -0,0 +1,144 @@
+# Copyright (c) 2025, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import pickle
+import random
+from datetime import date, datetime, timedelta
+
+from frappe.tests import UnitTestCase
+
+from crm.fcrm.doctype.crm_service_level_agreement.working_time import WEEKDAYS, WorkingCalendar
+
+
+def step_calc_time(start_at, duration_seconds, working_hours, holidays):
+	"""`calc_time` as it walked the calendar before working windows were used"""
+	res = start_at
+	time_needed = duration_seconds
+	while time_needed:
+		today_day = res.date()
+		today_weekday = WEEKDAYS[res.weekday()]
+		if today_day in holidays or today_weekday not in working_hours:
+			res += timedelta(days=1)
+			continue
+		start, end = working_hours[today_weekday]
+		now_in_seconds = (res - datetime.combine(today_day, datetime.min.time())).total_seconds()
+		start_time = max(start.total_seconds(), now_in_seconds)
+		till_start_time = max(start_time - now_in_seconds, 0)
+		end_time = max(end.total_seconds(), now_in_seconds)
+		time_left = max(end_time - start_time, 0)
+		if not time_left:
+			res = datetime.combine(today_day + timedelta(days=1), datetime.min.time())
+			continue
+		time_taken = min(time_needed, time_left)
+		time_needed -= time_taken
+		res += timedelta(seconds=till_start_time + time_taken)
+	return res
+
+
+def step_elapsed_time(start_at, end_at, working_hours, holidays):
+	"""`calc_elapsed_time` as it counted every second, with holidays"""
+	total_seconds = 0
+	current_time = start_at
+	while current_time < end_at:
+		start, end = working_hours.get(WEEKDAYS[current_time.weekday()], (None, None))
+		time_of_day = timedelta(
+			hours=current_time.hour, minutes=current_time.minute, seconds=current_time.second
+		)
+		if current_time.date() not in holidays and start is not None and start <= time_of_day < end:
+			total_seconds += 1
+		current_time += timedelta(seconds=1)
+	return total_seconds
+
+
+class TestWorkingCalendar(UnitTestCase):
+	def setUp(self):
+		self.random = random.Random(20250317)
+
+	def random_calendar(self):
+		working_hours = {}
+		for weekday in self.random.sample(WEEKDAYS, self.random.randint(1, 7)):
+			start = self.random.choice([0, 7, 9, 9.5, 13, 22]) * 3600
+			end = self.random.choice([0, 12, 17, 17.5, 18, 24]) * 3600 - self.random.choice([0, 1])
+			working_hours[weekday] = (timedelta(seconds=start), timedelta(seconds=max(end, 0)))
+		if not any(end > start for start, end in working_hours.values()):
+			working_hours["Monday"] = (timedelta(hours=9), timedelta(hours=17))
+
+		holidays = {date(2025, 3, 1) + timedelta(days=self.random.randint(0, 40)) for _i in range(5)}
+		return working_hours, holidays
+
+	def random_moment(self):
+		moment = datetime(2025, 3, 1) + timedelta(seconds=self.random.randint(0, 30 * 24 * 3600))
+		if self.random.random() < 0.3:
+			# on the hour, where windows open and close
+			moment = moment.replace(minute=0, second=0)
+		return moment
+
+	def test_add_working_time_matches_stepping(self):
+		for _i in range(500):
+			working_hours, holidays = self.random_calendar()
+			start_at = self.random_moment()
+			duration = self.random.choice([0, 1, 60, 3600, 8 * 3600, self.random.randint(1, 20 * 24 * 3600)])
+			with self.subTest(working_hours=working_hours, start_at=start_at, duration=duration):
+				self.assertEqual(
+					WorkingCalendar(working_hours, holidays).add_working_time(start_at, duration),
+					step_calc_time(start_at, duration, working_hours, holidays),
+				)
+
+	def test_elapsed_time_matches_stepping(self):
+		for _i in range(40):
+			working_hours, holidays = self.random_calendar()
+			start_at = self.random_moment() + timedelta(microseconds=self.random.choice([0, 250000]))
+			end_at = start_at + timedelta(seconds=self.random.randint(0, 26 * 3600))
+			end_at += timedelta(microseconds=self.random.choice([0, 500000]))
+			with self.subTest(working_hours=working_hours, start_at=start_at, end_at=end_at):
+				self.assertEqual(
+					WorkingCalendar(working_hours, holidays).get_elapsed_time(start_at, end_at),
+					step_elapsed_time(start_at, end_at, working_hours, holidays),
+				)
+
+	def test_elapsed_time_inverts_add_working_time(self):
+		for _i in range(300):
+			working_hours, holidays = self.random_calendar()
+			calendar = WorkingCalendar(working_hours, holidays)
+			# start inside a window so no time is skipped before counting starts
+			start_at = calendar.add_working_time(self.random_moment(), 1) - timedelta(seconds=1)
+			duration = self.random.randint(1, 60 * 24 * 3600)
+			end_at = calendar.add_working_time(start_at, duration)
+			self.assertEqual(calendar.get_elapsed_time(start_at, end_at), duration)
+
+	def test_holidays_and_days_off(self):
+		# Friday 16:00 with an hour to go on Friday, Monday is a holiday
+		calendar = WorkingCalendar(
+			{day: ("09:00:00", "17:00:00") for day in WEEKDAYS[:5]}, holidays=[date(2025, 3, 17)]
+		)
+		start_at = datetime(2025, 3, 14, 16)
+		self.assertEqual(calendar.add_working_time(start_at, 2 * 3600), datetime(2025, 3, 18, 10))
+		self.assertEqual(calendar.get_elapsed_time(start_at, datetime(2025, 3, 18, 10)), 2 * 3600)
+
+	def test_without_working_hours(self):
+		calendar = WorkingCalendar({"Monday": ("09:00:00", "09:00:00")})
+		self.assertIsNone(calendar.add_working_time(datetime(2025, 3, 17, 9), 60))
+		self.assertEqual(calendar.add_working_time(datetime(2025, 3, 17, 9), 0), datetime(2025, 3, 17, 9))
+
+	def test_cached_calendar_round_trip(self):
+		working_hours, holidays = self.random_calendar()
+		calendar = WorkingCalendar(working_hours, holidays, "Asia/Kolkata")
+		cached = pickle.loads(pickle.dumps(calendar))
+
+		start_at = self.random_moment()
+		self.assertEqual(cached.time_zone, "Asia/Kolkata")
+		self.assertEqual(cached.add_working_time(start_at, 3600), calendar.add_working_time(start_at, 3600))
+
+	def test_add_working_time_many_matches_one_by_one(self):
+		for _i in range(50):
+			working_hours, holidays = self.random_calendar()
+			calendar = WorkingCalendar(working_hours, holidays)
+			starts = [self.random_moment() for _j in range(20)]
+			durations = [self.random.choice([0, 60, self.random.randint(1, 30 * 24 * 3600)]) for _j in starts]
+			self.assertEqual(
+				calendar.add_working_time_many(starts, durations),
+				[
+					calendar.add_working_time(start_at, d)
+					for start_at, d in zip(starts, durations, strict=True)
+				],
+			)
@@ -1,9 +1,14 @@
+import unicodedata
+
 import frappe
+from frappe import _
 from frappe.model.document import Document
-from frappe.query_builder import JoinType
-from frappe.utils.safe_exec import get_safe_globals
-from frappe.utils import now_datetime
-from pypika import Criterion
+from frappe.utils import get_datetime, now_datetime
+from frappe.utils.safe_exec import (
+	WHITELISTED_SAFE_EVAL_GLOBALS,
+	_validate_safe_eval_syntax,
+	get_safe_globals,
+)
 
 def get_sla(doc: Document) -> Document:
 	"""
@@ -12,40 +17,90 @@ def get_sla(doc: Document) -> Document:
 	:param doc: Lead/Deal to use
 	:return: Applicable SLA
 	"""
-	SLA = frappe.qb.DocType("CRM Service Level Agreement")
-	Priority = frappe.qb.DocType("CRM Service Level Priority")
 	now = now_datetime()
 	priority = doc.communication_status
-	q = (
-		frappe.qb.from_(SLA)
-		.select(SLA.name, SLA.condition)
-		.where(SLA.apply_on == doc.doctype)
-		.where(SLA.enabled == True)
-		.where(Criterion.any([SLA.start_date.isnull(), SLA.start_date <= now]))
-		.where(Criterion.any([SLA.end_date.isnull(), SLA.end_date >= now]))
+	context = None
+
+	for sla in get_sla_rules(doc.doctype):
+		if sla.start_date and get_datetime(sla.start_date) > now:
+			continue
+		if sla.end_date and get_datetime(sla.end_date) < now:
+			continue
+		if priority and priority not in sla.priorities:
+			continue
+		if not sla.condition:
+			return sla
+
+		# the context is only built once a condition has to be evaluated
+		context = context or get_context(doc)
+		if eval_condition(sla.condition, context):
+			return sla
+	return None
+
+
+def get_sla_rules(doctype: str) -> list[dict]:
+	"""
+	Get enabled SLAs of `doctype` with their priorities, the default SLA last.
+
+	Rules are cached until an SLA changes, date ranges and conditions are
+	checked by `get_sla` for each document.
+	"""
+	key = f"crm_sla_rules:{doctype}"
+	rules = frappe.cache().get_value(key)
+	if rules is not None:
+		return rules
+
+	slas = frappe.get_all(
+		"CRM Service Level Agreement",
+		filters={"apply_on": doctype, "enabled": 1},
+		fields=["name", "condition", "default", "start_date", "end_date"],
+		order_by="creation asc",
 	)
-	if priority:
-		q = (
-			q.join(Priority, JoinType.inner)
-			.on(Priority.parent == SLA.name)
-			.where(Priority.priority == priority)
-		)
-	sla_list = q.run(as_dict=True)
-	res = None
-
-	# move default sla to the end of the list
-	for sla in sla_list:
-		if sla.get("default") == True:
-			sla_list.remove(sla)
-			sla_list.append(sla)
-			break
-
-	for sla in sla_list:
-		cond = sla.get("condition")
-		if not cond or frappe.safe_eval(cond, None, get_context(doc)):
-			res = sla
-			break
-	return res
+	priorities = frappe.get_all(
+		"CRM Service Level Priority",
+		filters={"parent": ("in", [sla.name for sla in slas]), "parenttype": "CRM Service Level Agreement"},
+		fields=["parent", "priority"],
+	)
+	for sla in slas:
+		sla.priorities = [p.priority for p in priorities if p.parent == sla.name]
+
+	rules = sorted(slas, key=lambda sla: bool(sla.default))
+	frappe.cache().set_value(key, rules)
+	return rules
+
+
+def clear_sla_rules(doctype=None):
+	frappe.cache().delete_keys(f"crm_sla_rules:{doctype}" if doctype else "crm_sla_rules:")
+
+
+def on_change(doc, method=None):
+	# an SLA may have moved from one doctype to another
+	clear_sla_rules()
+
+
+# compiled conditions keyed by their source, shared by all sites of the process
+compiled_conditions = {}
+
+
+def eval_condition(condition: str, context: dict):
+	"""Evaluate an SLA condition like `frappe.safe_eval`, compiling it only once"""
+	code = compiled_conditions.get(condition)
+	if code is None:
+		code = compile_condition(condition)
+		compiled_conditions[condition] = code
+
+	eval_globals = {"__builtins__": {}, **WHITELISTED_SAFE_EVAL_GLOBALS}
+	return eval(code, eval_globals, context)
+
+
+def compile_condition(condition: str):
+	"""Run the checks of `frappe.safe_eval` on `condition` and compile it"""
+	condition = unicodedata.normalize("NFKC", condition)
+	if "__" in condition:
+		frappe.throw(_('Illegal SLA condition {0}, cannot use "__"').format(frappe.bold(condition)))
+	_validate_safe_eval_syntax(condition)
+	return compile(condition, "<safe_eval>", "eval")
+
 
 def get_context(d: Document) -> dict:
 	"""
@@ -0,0 +1,200 @@
+import math
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, timezone
+
+import frappe
+from frappe.utils import convert_utc_to_timezone, get_datetime, get_system_timezone, getdate, to_timedelta
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+class WorkingCalendar:
+	"""
+	Working hours of an SLA, computed a day at a time.
+
+	Every day has at most one working window, so elapsed and target times are
+	sums over the days they span instead of walks over every second. Weekdays
+	with an empty window are working days without working hours.
+	"""
+
+	def __init__(self, working_hours: dict, holidays=(), time_zone=None):
+		"""
+		:param working_hours: `(start_time, end_time)` keyed by weekday name
+		:param holidays: dates without working hours
+		:param time_zone: zone of the working hours and of the datetimes passed in,
+		        the system time zone by default
+		"""
+		# window in seconds from midnight, keyed by `date.weekday()`
+		self.windows = {}
+		for weekday, (start_time, end_time) in working_hours.items():
+			if weekday in WEEKDAYS:
+				self.windows[WEEKDAYS.index(weekday)] = (to_seconds(start_time), to_seconds(end_time))
+		self.has_working_hours = any(end > start for start, end in self.windows.values())
+		self.holidays = frozenset(getdate(day) for day in holidays)
+		self.time_zone = time_zone or get_system_timezone()
+
+	def now(self) -> datetime:
+		"""Current time in the calendar's time zone"""
+		return convert_utc_to_timezone(datetime.now(timezone.utc), self.time_zone).replace(tzinfo=None)
+
+	def get_window(self, day: date):
+		"""Working window of `day` in seconds from midnight, `None` on days off"""
+		if day in self.holidays:
+			return None
+		return self.windows.get(day.weekday())
+
+	def add_working_time(self, start_at, duration_seconds: float) -> datetime | None:
+		"""
+		Get the moment `duration_seconds` of working time after `start_at`.
+
+		Counting starts at the time of day of `start_at` on the first working
+		day, even if `start_at` itself is on a day off.
+
+		:return: `None` if there are no working hours to count
+		"""
+		start_at = get_datetime(start_at)
+		if not duration_seconds:
+			return start_at
+		if not self.has_working_hours:
+			return None
+
+		day = start_at.date()
+		time_of_day = (start_at - datetime.combine(day, datetime.min.time())).total_seconds()
+		time_needed = duration_seconds
+		while True:
+			window = self.get_window(day)
+			if not window:
+				day += timedelta(days=1)
+				continue
+
+			start = max(window[0], time_of_day)
+			time_left = max(window[1] - start, 0)
+			if time_needed <= time_left:
+				return datetime.combine(day, datetime.min.time()) + timedelta(seconds=start + time_needed)
+
+			time_needed -= time_left
+			day += timedelta(days=1)
+			time_of_day = 0
+
+	def add_working_time_many(self, starts: list, durations: list) -> list[datetime | None]:
+		"""
+		Get `add_working_time` of many starts and durations at once.
+
+		Working seconds of whole days are added up once into running totals
+		over the days the starts span, each target is then found with a binary
+		search in them instead of a walk over its days.
+		"""
+		starts = [get_datetime(start_at) for start_at in starts]
+		if not self.has_working_hours:
+			return [
+				start_at if not duration else None
+				for start_at, duration in zip(starts, durations, strict=True)
+			]
+		if not starts:
+			return []
+
+		first_day = min(start_at.date() for start_at in starts)
+		# working seconds of the days before `first_day + i`
+		totals = [0]
+
+		def extend_totals(days=0, seconds=0):
+			while len(totals) <= days or totals[-1] < seconds:
+				window = self.get_window(first_day + timedelta(days=len(totals) - 1))
+				totals.append(totals[-1] + (max(window[1] - window[0], 0) if window else 0))
+
+		targets = []
+		for start_at, duration in zip(starts, durations, strict=True):
+			if not duration:
+				targets.append(start_at)
+				continue
+
+			# the first working day starts at the time of day of `start_at`
+			day = start_at.date()
+			while not self.get_window(day):
+				day += timedelta(days=1)
+			window = self.get_window(day)
+			time_of_day = (start_at - datetime.combine(start_at.date(), datetime.min.time())).total_seconds()
+			start = max(window[0], time_of_day)
+			time_left = max(window[1] - start, 0)
+			if duration <= time_left:
+				targets.append(
+					datetime.combine(day, datetime.min.time()) + timedelta(seconds=start + duration)
+				)
+				continue
+
+			# whole days after the first one
+			days = (day - first_day).days + 1
+			extend_totals(days=days)
+			total_needed = totals[days] + duration - time_left
+			extend_totals(seconds=total_needed)
+			last = bisect_left(totals, total_needed, lo=days) - 1
+			last_day = first_day + timedelta(days=last)
+			offset = self.get_window(last_day)[0] + total_needed - totals[last]
+			targets.append(datetime.combine(last_day, datetime.min.time()) + timedelta(seconds=offset))
+		return targets
+
+	def get_elapsed_time(self, start_at, end_at) -> int:
+		"""
+		Get the working seconds from `start_at` to `end_at`.
+
+		Seconds are counted on whole second marks from `start_at`, like a clock
+		ticking from the start, so a partial second at either end is not counted.
+		"""
+		start_at, end_at = get_datetime(start_at), get_datetime(end_at)
+		if end_at <= start_at:
+			return 0
+
+		# count ticks on whole seconds, the sub second offset of `start_at` is
+		# moved to `end_at` instead
+		offset = timedelta(microseconds=start_at.microsecond)
+		start_at, end_at = start_at - offset, end_at - offset
+
+		elapsed = 0
+		day = start_at.date()
+		while day <= end_at.date():
+			window = self.get_window(day)
+			if window:
+				midnight = datetime.combine(day, datetime.min.time())
+				window_start = max(midnight + timedelta(seconds=window[0]), start_at)
+				window_end = min(midnight + timedelta(seconds=window[1]), end_at)
+				if window_end > window_start:
+					elapsed += math.ceil((window_end - window_start).total_seconds())
+			day += timedelta(days=1)
+		return elapsed
+
+
+def get_calendar(sla) -> WorkingCalendar:
+	"""
+	Get the calendar of a saved `sla`.
+
+	Calendars are cached until the SLA, its working hours or its holiday list
+	change, so targets are computed without loading the holiday list again.
+	"""
+	time_zone = get_system_timezone()
+	key = f"crm_sla_calendar:{sla.name}:{time_zone}"
+	calendar = frappe.cache().get_value(key)
+	if calendar is None:
+		calendar = WorkingCalendar(sla.get_working_hours(), sla.get_holidays(), time_zone)
+		frappe.cache().set_value(key, calendar)
+	return calendar
+
+
+def clear_calendars(sla=None):
+	"""Drop the cached calendar of `sla`, or of every SLA"""
+	frappe.cache().delete_keys(f"crm_sla_calendar:{sla}:" if sla else "crm_sla_calendar:")
+
+
+def on_change(doc, method=None):
+	if doc.doctype == "CRM Service Level Agreement":
+		# working hours are saved with the SLA
+		clear_calendars(doc.name)
+	elif doc.doctype == "CRM Holiday List":
+		clear_calendars()
+
+
+def to_seconds(value) -> float:
+	if value is None:
+		return 0
+	if not isinstance(value, timedelta):
+		value = to_timedelta(value)
+	return value.total_seconds()
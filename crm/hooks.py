@@ -141,22 +141,168 @@ override_doctype_class = {
 doc_events = {
 	"Contact": {
 		"validate": ["crm.api.contact.validate"],
+		"after_insert": ["crm.api.count.on_change", "crm.api.snapshot.on_change"],
+		"on_update": [
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.search.on_change",
+		],
+		"on_trash": [
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.search.on_change",
+		],
 	},
 	"ToDo": {
 		"after_insert": ["crm.api.todo.after_insert"],
 		"on_update": ["crm.api.todo.on_update"],
+		"on_trash": ["crm.api.todo.on_trash"],
 	},
 	"Comment": {
-		"on_update": ["crm.api.comment.on_update"],
+		"on_update": [
+			"crm.api.comment.on_update",
+			"crm.api.activity_feed.sync",
+			"crm.fcrm.doctype.crm_counter.crm_counter.on_change",
+		],
+		"on_trash": ["crm.api.activity_feed.sync", "crm.fcrm.doctype.crm_counter.crm_counter.on_change"],
 	},
 	"WhatsApp Message": {
 		"validate": ["crm.api.whatsapp.validate"],
-		"on_update": ["crm.api.whatsapp.on_update"],
+		"on_update": ["crm.api.whatsapp.on_update", "crm.api.activity_feed.sync"],
+		"on_trash": ["crm.api.activity_feed.sync"],
 	},
 	"CRM Deal": {
+		"after_insert": ["crm.api.count.on_change", "crm.api.snapshot.on_change"],
+		"on_update": [
+			"crm.fcrm.doctype.erpnext_crm_settings.erpnext_crm_settings.create_customer_in_erpnext",
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.search.on_change",
+		],
+		"on_trash": [
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.search.on_change",
+		],
+	},
+	"CRM Lead": {
+		"after_insert": ["crm.api.count.on_change", "crm.api.snapshot.on_change"],
+		"on_update": [
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.search.on_change",
+		],
+		"on_trash": [
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.search.on_change",
+		],
+	},
+	"CRM Organization": {
+		"after_insert": ["crm.api.count.on_change", "crm.api.snapshot.on_change"],
+		"on_update": [
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.search.on_change",
+		],
+		"on_trash": [
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.search.on_change",
+		],
+	},
+	"CRM Task": {
+		"after_insert": ["crm.api.count.on_change", "crm.api.snapshot.on_change"],
+		"on_update": [
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.search.on_change",
+			"crm.api.activity_feed.sync",
+			"crm.fcrm.doctype.crm_counter.crm_counter.on_change",
+		],
+		"on_trash": [
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.search.on_change",
+			"crm.api.activity_feed.sync",
+			"crm.fcrm.doctype.crm_counter.crm_counter.on_change",
+		],
+	},
+	"FCRM Note": {
+		"after_insert": ["crm.api.count.on_change", "crm.api.snapshot.on_change"],
 		"on_update": [
-			"crm.fcrm.doctype.erpnext_crm_settings.erpnext_crm_settings.create_customer_in_erpnext"
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.search.on_change",
+			"crm.api.activity_feed.sync",
+			"crm.fcrm.doctype.crm_counter.crm_counter.on_change",
 		],
+		"on_trash": [
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.search.on_change",
+			"crm.api.activity_feed.sync",
+			"crm.fcrm.doctype.crm_counter.crm_counter.on_change",
+		],
+	},
+	"CRM Call Log": {
+		"after_insert": ["crm.api.count.on_change", "crm.api.snapshot.on_change"],
+		"on_update": [
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.activity_feed.sync",
+		],
+		"on_trash": [
+			"crm.api.count.on_change",
+			"crm.api.snapshot.on_change",
+			"crm.api.activity_feed.sync",
+		],
+	},
+	"Version": {
+		"on_update": ["crm.api.activity_feed.sync"],
+		"on_trash": ["crm.api.activity_feed.sync"],
+	},
+	"Communication": {
+		"on_update": ["crm.api.activity_feed.sync", "crm.fcrm.doctype.crm_counter.crm_counter.on_change"],
+		"on_trash": ["crm.api.activity_feed.sync", "crm.fcrm.doctype.crm_counter.crm_counter.on_change"],
+	},
+	"File": {
+		"on_update": ["crm.api.activity_feed.sync"],
+		"on_trash": ["crm.api.activity_feed.sync"],
+	},
+	"CRM Service Level Agreement": {
+		"on_update": [
+			"crm.fcrm.doctype.crm_service_level_agreement.working_time.on_change",
+			"crm.fcrm.doctype.crm_service_level_agreement.utils.on_change",
+		],
+		"on_trash": [
+			"crm.fcrm.doctype.crm_service_level_agreement.working_time.on_change",
+			"crm.fcrm.doctype.crm_service_level_agreement.utils.on_change",
+		],
+	},
+	"CRM Holiday List": {
+		"on_update": ["crm.fcrm.doctype.crm_service_level_agreement.working_time.on_change"],
+		"on_trash": ["crm.fcrm.doctype.crm_service_level_agreement.working_time.on_change"],
+	},
+	"CRM View Settings": {
+		"on_update": ["crm.api.view_meta.on_change"],
+		"on_trash": ["crm.api.view_meta.on_change"],
+	},
+	"CRM Form Script": {
+		"on_update": ["crm.api.view_meta.on_change"],
+		"on_trash": ["crm.api.view_meta.on_change"],
+	},
+	"Custom Field": {
+		"on_update": ["crm.api.view_meta.on_change", "crm.api.activities.on_meta_change"],
+		"on_trash": ["crm.api.view_meta.on_change", "crm.api.activities.on_meta_change"],
+	},
+	"Property Setter": {
+		"on_update": ["crm.api.view_meta.on_change", "crm.api.activities.on_meta_change"],
+		"on_trash": ["crm.api.view_meta.on_change", "crm.api.activities.on_meta_change"],
+	},
+	"DocType": {
+		"on_update": ["crm.api.view_meta.on_change", "crm.api.activities.on_meta_change"],
+		"on_trash": ["crm.api.view_meta.on_change", "crm.api.activities.on_meta_change"],
 	},
 	"User": {
 		"before_validate": ["crm.api.demo.validate_user"],
@@ -167,23 +313,11 @@ doc_events = {
 # Scheduled Tasks
 # ---------------
 
-# scheduler_events = {
-# "all": [
-# "crm.tasks.all"
-# ],
-# "daily": [
-# "crm.tasks.daily"
-# ],
-# "hourly": [
-# "crm.tasks.hourly"
-# ],
-# "weekly": [
-# "crm.tasks.weekly"
-# ],
-# "monthly": [
-# "crm.tasks.monthly"
-# ],
-# }
+scheduler_events = {
+	"cron": {
+		"*/5 * * * *": ["crm.fcrm.doctype.crm_service_level_agreement.breach.mark_breached_slas"],
+	},
+}
 
 # Testing
 # -------
@@ -1,5 +1,6 @@
 import frappe
 from frappe.query_builder import Order
+from pypika import Criterion
 from pypika.functions import Replace
 
 from crm.utils import are_same_phone_number, parse_phone_number
@@ -109,20 +110,71 @@ def add_task_to_call_log(call_sid, task):
 @frappe.whitelist()
 def get_contact_by_phone_number(phone_number):
 	"""Get contact by phone number."""
+	return get_contact(*resolve_phone_number(phone_number))
+
+
+def get_contacts_by_phone_numbers(phone_numbers):
+	"""
+	Get contacts of many phone numbers with a fixed number of queries.
+
+	:return: dict of phone number and the contact `get_contact_by_phone_number` returns for it
+	"""
+	numbers = {}
+	for phone_number in set(phone_numbers):
+		if phone_number:
+			numbers[phone_number] = resolve_phone_number(phone_number)
+
+	cleaned_numbers = [clean_phone_number(number) for number, _country, _exact in numbers.values()]
+	contacts = get_contacts_matching(cleaned_numbers)
+	deals = get_primary_deals(contacts)
+	leads = None
+
+	result = {phone_number: {"mobile_no": phone_number} for phone_number in phone_numbers}
+	for phone_number, (number, country, exact_match) in numbers.items():
+		cleaned_number = clean_phone_number(number)
+		candidates = [c for c in contacts if cleaned_number in clean_phone_number(c.mobile_no)]
+		contact = pick_contact(candidates, deals, number, country, exact_match)
+		if not contact:
+			if leads is None:
+				leads = get_leads_matching(cleaned_numbers)
+			candidates = [lead for lead in leads if cleaned_number in clean_phone_number(lead.mobile_no)]
+			contact = pick_lead(candidates, number, country, exact_match)
+		result[phone_number] = contact or {"mobile_no": number}
+
+	return result
+
+
+def resolve_phone_number(phone_number):
+	"""Return number to look up, its country and whether it must match exactly"""
 	number = parse_phone_number(phone_number)
 
 	if number.get("is_valid"):
-		return get_contact(number.get("national_number"), number.get("country"))
+		return number.get("national_number"), number.get("country"), False
 	else:
-		return get_contact(phone_number, number.get("country"), exact_match=True)
+		return phone_number, number.get("country"), True
 
 
 def get_contact(phone_number, country="IN", exact_match=False):
 	if not phone_number:
 		return {"mobile_no": phone_number}
 
-	cleaned_number = (
-		phone_number.strip()
+	cleaned_number = clean_phone_number(phone_number)
+
+	# Check if the number is associated with a contact
+	contacts = get_contacts_matching([cleaned_number])
+	contact = pick_contact(contacts, get_primary_deals(contacts), phone_number, country, exact_match)
+	if contact:
+		return contact
+
+	# Else, Check if the number is associated with a lead
+	lead = pick_lead(get_leads_matching([cleaned_number]), phone_number, country, exact_match)
+	return lead or {"mobile_no": phone_number}
+
+
+def clean_phone_number(phone_number):
+	return (
+		(phone_number or "")
+		.strip()
 		.replace(" ", "")
 		.replace("-", "")
 		.replace("(", "")
@@ -130,54 +182,74 @@ def get_contact(phone_number, country="IN", exact_match=False):
 		.replace("+", "")
 	)
 
-	# Check if the number is associated with a contact
-	Contact = frappe.qb.DocType("Contact")
-	normalized_phone = Replace(
-		Replace(Replace(Replace(Replace(Contact.mobile_no, " ", ""), "-", ""), "(", ""), ")", ""), "+", ""
-	)
 
+def normalized_phone(column):
+	return Replace(Replace(Replace(Replace(Replace(column, " ", ""), "-", ""), "(", ""), ")", ""), "+", "")
+
+
+def get_contacts_matching(cleaned_numbers):
+	if not cleaned_numbers:
+		return []
+
+	Contact = frappe.qb.DocType("Contact")
+	normalized = normalized_phone(Contact.mobile_no)
 	query = (
 		frappe.qb.from_(Contact)
 		.select(Contact.name, Contact.full_name, Contact.image, Contact.mobile_no)
-		.where(normalized_phone.like(f"%{cleaned_number}%"))
+		.where(Criterion.any([normalized.like(f"%{number}%") for number in cleaned_numbers]))
 		.orderby("modified", order=Order.desc)
 	)
-	contacts = query.run(as_dict=True)
-
-	if len(contacts):
-		# Check if the contact is associated with a deal
-		for contact in contacts:
-			if frappe.db.exists("CRM Contacts", {"contact": contact.name, "is_primary": 1}):
-				deal = frappe.db.get_value(
-					"CRM Contacts", {"contact": contact.name, "is_primary": 1}, "parent"
-				)
-				if are_same_phone_number(contact.mobile_no, phone_number, country, validate=not exact_match):
-					contact["deal"] = deal
-					return contact
-		# Else, return the first contact
-		if are_same_phone_number(contacts[0].mobile_no, phone_number, country, validate=not exact_match):
-			return contacts[0]
+	return query.run(as_dict=True)
 
-	# Else, Check if the number is associated with a lead
-	Lead = frappe.qb.DocType("CRM Lead")
-	normalized_phone = Replace(
-		Replace(Replace(Replace(Replace(Lead.mobile_no, " ", ""), "-", ""), "(", ""), ")", ""), "+", ""
-	)
 
+def get_leads_matching(cleaned_numbers):
+	if not cleaned_numbers:
+		return []
+
+	Lead = frappe.qb.DocType("CRM Lead")
+	normalized = normalized_phone(Lead.mobile_no)
 	query = (
 		frappe.qb.from_(Lead)
 		.select(Lead.name, Lead.lead_name, Lead.image, Lead.mobile_no)
 		.where(Lead.converted == 0)
-		.where(normalized_phone.like(f"%{cleaned_number}%"))
+		.where(Criterion.any([normalized.like(f"%{number}%") for number in cleaned_numbers]))
 		.orderby("modified", order=Order.desc)
 	)
-	leads = query.run(as_dict=True)
+	return query.run(as_dict=True)
+
+
+def get_primary_deals(contacts):
+	"""Deals of `contacts` where they are the primary contact, keyed by contact"""
+	if not contacts:
+		return {}
+
+	deals = frappe.get_all(
+		"CRM Contacts",
+		filters={"contact": ("in", [c.name for c in contacts]), "is_primary": 1},
+		fields=["contact", "parent"],
+	)
+	primary_deals = {}
+	for deal in deals:
+		primary_deals.setdefault(deal.contact, deal.parent)
+	return primary_deals
+
+
+def pick_contact(contacts, primary_deals, phone_number, country, exact_match):
+	if not contacts:
+		return None
+
+	# Check if the contact is associated with a deal
+	for contact in contacts:
+		deal = primary_deals.get(contact.name)
+		if deal and are_same_phone_number(contact.mobile_no, phone_number, country, validate=not exact_match):
+			return frappe._dict(contact, deal=deal)
+
+	# Else, return the first contact
+	if are_same_phone_number(contacts[0].mobile_no, phone_number, country, validate=not exact_match):
+		return frappe._dict(contacts[0])
 
-	if len(leads):
-		for lead in leads:
-			if are_same_phone_number(lead.mobile_no, phone_number, country, validate=not exact_match):
-				lead["lead"] = lead.name
-				lead["full_name"] = lead.lead_name
-				return lead
 
-	return {"mobile_no": phone_number}
+def pick_lead(leads, phone_number, country, exact_match):
+	for lead in leads:
+		if are_same_phone_number(lead.mobile_no, phone_number, country, validate=not exact_match):
+			return frappe._dict(lead, lead=lead.name, full_name=lead.lead_name)
@@ -0,0 +1,11 @@
+import frappe
+
+
+def execute():
+	frappe.enqueue(
+		"crm.api.activity_feed.run_backfill_job",
+		queue="long",
+		timeout=3600,
+		job_id="crm_activity_feed_backfill",
+		deduplicate=True,
+	)
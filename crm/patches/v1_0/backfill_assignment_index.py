@@ -0,0 +1,10 @@
+import frappe
+
+
+def execute():
+	frappe.enqueue(
+		"crm.fcrm.doctype.crm_assignment.crm_assignment.backfill",
+		queue="long",
+		job_id="crm_assignment_backfill",
+		deduplicate=True,
+	)
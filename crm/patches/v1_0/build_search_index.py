@@ -0,0 +1,10 @@
+import frappe
+
+
+def execute():
+	frappe.enqueue(
+		"crm.api.search.build_index",
+		queue="long",
+		job_id="crm_search_index_build",
+		deduplicate=True,
+	)
@@ -0,0 +1,10 @@
+import frappe
+
+
+def execute():
+	frappe.enqueue(
+		"crm.fcrm.doctype.crm_counter.crm_counter.rebuild",
+		queue="long",
+		job_id="crm_counter_rebuild",
+		deduplicate=True,
+	)
@@ -1,3 +1,4 @@
+import frappe
 import phonenumbers
 from frappe.utils import floor
 from phonenumbers import NumberParseException
@@ -93,3 +94,22 @@ def seconds_to_duration(seconds):
 		return f"{seconds}s"
 	else:
 		return "0s"
+
+
+def get_cache_version(prefix, doctype):
+	"""
+	Get the version token of a group of cache entries of `doctype`.
+
+	Entries put the token in their keys, so `clear_cache_version` drops all
+	of them at once without scanning for keys.
+	"""
+	key = f"{prefix}:{doctype}"
+	version = frappe.cache().get_value(key)
+	if not version:
+		version = frappe.generate_hash(length=8)
+		frappe.cache().set_value(key, version)
+	return version
+
+
+def clear_cache_version(prefix, doctype):
+	frappe.cache().delete_value(f"{prefix}:{doctype}")
@@ -0,0 +1,112 @@
+"""
+Extract values from small HTML snippets without building a document tree.
+
+Results match what BeautifulSoup's "html.parser" tree gives for the same
+lookups, parsing stops as soon as the value is found.
+"""
+
+from html.parser import HTMLParser
+
+# elements that never have content, they are closed as soon as they are opened
+VOID_ELEMENTS = {
+	"area",
+	"base",
+	"br",
+	"col",
+	"embed",
+	"hr",
+	"img",
+	"input",
+	"link",
+	"meta",
+	"param",
+	"source",
+	"track",
+	"wbr",
+}
+
+# elements whose content is not part of the text of their parents
+NON_TEXT_ELEMENTS = {"script", "style", "template"}
+
+
+class StopParsing(Exception):
+	pass
+
+
+class LinkExtractor(HTMLParser):
+	"""Attributes and text of the first `a` element"""
+
+	def __init__(self):
+		super().__init__(convert_charrefs=True)
+		self.open_tags = []
+		self.attrs = None
+		self.text = []
+		# number of open elements around the link
+		self.depth = None
+
+	def handle_starttag(self, tag, attrs):
+		if self.attrs is None and tag == "a":
+			self.attrs = get_attrs(attrs)
+			self.depth = len(self.open_tags)
+		if tag not in VOID_ELEMENTS:
+			self.open_tags.append(tag)
+
+	def handle_endtag(self, tag):
+		# like the tree builder, an end tag closes the elements opened after its
+		# start tag and end tags without a start tag are ignored
+		if tag not in self.open_tags:
+			return
+		while self.open_tags.pop() != tag:
+			pass
+		if self.depth is not None and len(self.open_tags) <= self.depth:
+			raise StopParsing
+
+	def handle_data(self, data):
+		if self.depth is not None and not NON_TEXT_ELEMENTS.intersection(self.open_tags[self.depth :]):
+			self.text.append(data)
+
+
+class MentionExtractor(HTMLParser):
+	"""Users mentioned with `<span data-type="mention">` by the comment editor"""
+
+	def __init__(self):
+		super().__init__(convert_charrefs=True)
+		self.mentions = []
+
+	def handle_starttag(self, tag, attrs):
+		if tag != "span":
+			return
+		attrs = get_attrs(attrs)
+		if attrs.get("data-type") == "mention":
+			self.mentions.append({"full_name": attrs.get("data-label"), "email": attrs.get("data-id")})
+
+
+def get_first_link(html):
+	"""
+	Get the first link of `html`.
+
+	:return: `attrs` and `text` of the link, `None` if there is no link
+	"""
+	parser = LinkExtractor()
+	try:
+		parser.feed(html)
+		parser.close()
+	except StopParsing:
+		pass
+
+	if parser.attrs is None:
+		return None
+	return {"attrs": parser.attrs, "text": "".join(parser.text)}
+
+
+def get_mentions(html):
+	"""Get `full_name` and `email` of users mentioned in `html`, in order of appearance"""
+	parser = MentionExtractor()
+	parser.feed(html)
+	parser.close()
+	return parser.mentions
+
+
+def get_attrs(attrs):
+	# the last of repeated attributes wins and attributes without a value are empty
+	return {name: value if value is not None else "" for name, value in attrs}
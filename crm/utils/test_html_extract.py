@@ -0,0 +1,57 @@
+# Copyright (c) 2025, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+from bs4 import BeautifulSoup
+from frappe.tests import UnitTestCase
+
+from crm.utils.html_extract import get_first_link, get_mentions
+
+LINK_SNIPPETS = [
+	'<a href="/files/report.pdf" target="_blank">report.pdf</a>',
+	"Added <a href='/private/files/contract.docx'>contract.docx</a>",
+	'<p><a href="/files/a.png"><b>a</b>.png</a> and <a href="/files/b.png">b.png</a></p>',
+	'<a href="/files/Q&amp;A.txt">Q&amp;A &lt;draft&gt;&nbsp;.txt</a>',
+	'<div><a href="/files/open.txt">open<span>ed</div>after',
+	'<a href="/files/x.txt">x<br>y<img src="y.png">z</a>',
+	'<a href="/files/script.txt">before<script>var a = "</b>";</script>after</a>',
+	'<a href="/files/comment.txt">keep<!-- drop -->this</a>',
+	'<a href="/files/first.txt" href="/files/second.txt">repeated</a>',
+	"<a href>no href value</a>",
+	'<a href="/files/empty.txt"/>after empty link',
+	'<a href="/files/stray.txt">stray</b> end tag</a>',
+	'<a href="/files/unclosed.txt">never closed',
+	"Removed report.pdf",
+	"",
+]
+
+MENTION_SNIPPETS = [
+	'<p>Hi <span class="mention" data-type="mention" data-id="jane@example.com" data-label="Jane">'
+	"@Jane</span></p>",
+	'<span data-type="mention" data-id="a@example.com" data-label="A"></span>'
+	'<span data-type="mention" data-id="b@example.com" data-label="B &amp; Co"></span>',
+	'<span data-type="mention" data-id="no-label@example.com"></span>',
+	'<span data-type="mention"/>',
+	'<span data-type="other" data-id="x@example.com"></span><div data-type="mention" data-id="y"></div>',
+	'<SPAN DATA-TYPE="mention" DATA-ID="upper@example.com" DATA-LABEL="Upper"></SPAN>',
+	"<p>No mentions here</p>",
+]
+
+
+class TestHTMLExtract(UnitTestCase):
+	def test_first_link_matches_beautifulsoup(self):
+		for html in LINK_SNIPPETS:
+			with self.subTest(html=html):
+				a_tag = BeautifulSoup(html, "html.parser").find("a")
+				expected = {"attrs": a_tag.attrs, "text": a_tag.text} if a_tag else None
+				self.assertEqual(get_first_link(html), expected)
+
+	def test_mentions_match_beautifulsoup(self):
+		for html in MENTION_SNIPPETS:
+			with self.subTest(html=html):
+				expected = [
+					{"full_name": d.get("data-label"), "email": d.get("data-id")}
+					for d in BeautifulSoup(html, "html.parser").find_all(
+						"span", attrs={"data-type": "mention"}
+					)
+				]
+				self.assertEqual(get_mentions(html), expected)